@@ -17,6 +17,11 @@ REQUIRED_PACKAGES = [
     ('moviepy', 'moviepy'),
 ]
 
+OPTIONAL_PACKAGES = [
+    ('lxml', 'lxml'),
+    ('pyarrow', 'pyarrow'),
+]
+
 def check_and_install_package(package_name, pip_name=None):
     """Check if a package is installed, and install it if not."""
     if pip_name is None:
@@ -60,6 +65,10 @@ def install_dependencies():
         if not check_and_install_package(package_name, pip_name):
             missing_packages.append(package_name)
     
+    for package_name, pip_name in OPTIONAL_PACKAGES:
+        if not check_and_install_package(package_name, pip_name):
+            print(f"Optional package {package_name} is not available, continuing without it.")
+    
     if missing_packages:
         print(f"\nWarning: The following packages could not be installed: {', '.join(missing_packages)}")
         print("Please install them manually before running the program.")
@@ -80,24 +89,1976 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
 import os
 import pygame
-from pytubefix import YouTube, Playlist
+from pytubefix import YouTube, Playlist, extract
 import re
+import fnmatch
 from pathlib import Path
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer, FeatureNotFound
 import csv
 import json
-from urllib.parse import urljoin, urlparse
+import sqlite3
+import codecs
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qs, parse_qsl, urlencode, unquote
 import time
-from PyPDF2 import PdfMerger, PdfReader, PdfWriter
+import math
+import mimetypes
+import io
+import tempfile
+import queue
+import hashlib
+from email.utils import parsedate_to_datetime
+from types import SimpleNamespace
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from collections import deque
+from array import array
+from functools import partial
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NullObject, NumberObject, StreamObject
 from PIL import Image
 import moviepy.editor as mp
+from moviepy.config import get_setting
+
+
+APP_DATA_DIR = Path.home() / ".stevies_file_emporium"
+
+
+class UiDispatcher:
+    """Applies UI updates posted from worker threads on the Tk thread, batched at a capped frame rate.
+
+    Log lines for the same widget are joined into one insert, and updates posted with a ``key``
+    (progress values, table cells) are coalesced so only the latest value is drawn each frame.
+    """
+    
+    def __init__(self, root, fps=20, max_log_lines=5000, max_ops_per_frame=20000):
+        self.root = root
+        self.interval = max(1, int(1000 / fps))
+        self.max_log_lines = max_log_lines
+        self.max_ops_per_frame = max_ops_per_frame
+        self.queue = queue.Queue()
+        self.root.after(self.interval, self.drain)
+    
+    def log(self, widget, message):
+        self.queue.put(('log', widget, message, None))
+    
+    def set_var(self, variable, value):
+        self.queue.put(('call', variable.set, (value,), {}, ('var', str(variable))))
+    
+    def call(self, func, *args, key=None, **kwargs):
+        self.queue.put(('call', func, args, kwargs, key))
+    
+    def drain(self):
+        try:
+            self.apply(self.collect())
+        finally:
+            # rescheduled whatever happens, or every later update would be lost
+            self.root.after(self.interval, self.drain)
+    
+    def collect(self):
+        ops = []
+        keyed = {}
+        logs = {}
+        try:
+            for _ in range(self.max_ops_per_frame):
+                item = self.queue.get_nowait()
+                if item[0] == 'log':
+                    _, widget, message, _ = item
+                    if id(widget) in logs:
+                        logs[id(widget)].append(message)
+                    else:
+                        logs[id(widget)] = [message]
+                        ops.append(('log', widget, logs[id(widget)]))
+                    continue
+                
+                key = item[4]
+                if key is not None:
+                    if key in keyed:
+                        ops[keyed[key]] = None
+                    keyed[key] = len(ops)
+                ops.append(item)
+        except queue.Empty:
+            pass
+        return ops
+    
+    def apply(self, ops):
+        for op in ops:
+            if op is None:
+                continue
+            try:
+                if op[0] == 'log':
+                    self.write_log(op[1], op[2])
+                else:
+                    _, func, args, kwargs, _ = op
+                    func(*args, **kwargs)
+            except tk.TclError:
+                # the widget was destroyed
+                pass
+            except Exception as e:
+                print(f"UI update failed: {e}")
+    
+    def write_log(self, widget, messages):
+        widget.insert(tk.END, "\n".join(messages) + "\n")
+        line_count = int(widget.index('end-1c').split('.')[0])
+        if line_count > self.max_log_lines:
+            widget.delete('1.0', f"{line_count - self.max_log_lines}.0")
+        widget.see(tk.END)
+
+
+class DiskCache:
+    """JSON entries on disk, one file per key, with TTL expiry and least-recently-used size eviction.
+
+    An entry may carry a binary body, stored next to its JSON file and evicted with it.
+    """
+    
+    def __init__(self, directory, ttl=None, max_bytes=50 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = sum(self.entry_size(path) for path in self.directory.glob('*.json'))
+    
+    def path_for(self, key):
+        return self.directory / (hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+    
+    def body_path(self, path):
+        return path.with_suffix('.body')
+    
+    def entry_size(self, path):
+        size = 0
+        for part in (path, self.body_path(path)):
+            try:
+                size += part.stat().st_size
+            except OSError:
+                pass
+        return size
+    
+    def get(self, key):
+        path = self.path_for(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('expires') is not None and time.time() > entry['expires']:
+            self.delete(key)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry['value']
+    
+    def get_body(self, key):
+        try:
+            with open(self.body_path(self.path_for(key)), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+    
+    def put(self, key, value, ttl=None, body=None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        entry = {'key': key, 'stored': now, 'expires': now + ttl if ttl else None, 'value': value}
+        path = self.path_for(key)
+        if body is not None:
+            temp_body_path = path.with_name(f"{path.stem}.body.{threading.get_ident()}.tmp")
+            with open(temp_body_path, 'wb') as f:
+                f.write(body)
+        
+        with self.lock:
+            old_size = self.entry_size(path)
+            if body is not None:
+                os.replace(temp_body_path, self.body_path(path))
+            else:
+                try:
+                    self.body_path(path).unlink()
+                except OSError:
+                    pass
+            write_json_atomic(path, entry)
+            self.total_bytes += self.entry_size(path) - old_size
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+    
+    def delete(self, key):
+        path = self.path_for(key)
+        with self.lock:
+            self.total_bytes -= self.entry_size(path)
+            self.remove_entry(path)
+    
+    def remove_entry(self, path):
+        for part in (path, self.body_path(path)):
+            try:
+                part.unlink()
+            except OSError:
+                pass
+    
+    def evict(self):
+        entries = []
+        for path in self.directory.glob('*.json'):
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            entries.append((mtime, self.entry_size(path), path))
+        self.total_bytes = sum(size for _, size, _ in entries)
+        
+        target = self.max_bytes * 0.9
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if self.total_bytes <= target:
+                break
+            self.remove_entry(path)
+            self.total_bytes -= size
+
+
+class HttpCache:
+    """Persistent page cache that revalidates with ETag / Last-Modified so unchanged pages come back as 304s.
+
+    A page is served without contacting the server only while the server's ``Cache-Control:
+    max-age`` or ``Expires`` says it is fresh, or for ``default_max_age`` seconds if that is set.
+    Pages with neither a freshness lifetime nor validators are not stored; ``no-store`` responses
+    are never cached.
+    """
+    
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024, default_max_age=0):
+        self.store = DiskCache(directory, max_bytes=max_bytes)
+        self.default_max_age = default_max_age
+    
+    def max_age(self, headers):
+        cache_control = headers.get('Cache-Control', '').lower()
+        if 'no-cache' in cache_control:
+            return 0
+        match = re.search(r'max-age=(\d+)', cache_control)
+        if match:
+            return int(match.group(1))
+        if headers.get('Expires'):
+            try:
+                expires = parsedate_to_datetime(headers['Expires']).timestamp()
+                date = parsedate_to_datetime(headers['Date']).timestamp() if headers.get('Date') else time.time()
+            except (TypeError, ValueError):
+                # an invalid Expires means already expired
+                return 0
+            return max(0, int(expires - date))
+        return self.default_max_age
+    
+    def fetch(self, session, url, timeout=30):
+        """Return ``(text, status)`` where status is 'fresh', 'revalidated' or 'fetched'."""
+        meta = self.store.get(url)
+        body = self.store.get_body(url) if meta else None
+        headers = {}
+        if meta and body is not None:
+            if time.time() < meta['stored'] + meta['max_age']:
+                return body.decode(meta['encoding'], errors='replace'), 'fresh'
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        
+        response = session.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and headers:
+            meta['stored'] = time.time()
+            self.store.put(url, meta, body=body)
+            return body.decode(meta['encoding'], errors='replace'), 'revalidated'
+        response.raise_for_status()
+        
+        cache_control = response.headers.get('Cache-Control', '').lower()
+        if 'no-store' not in cache_control:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            max_age = self.max_age(response.headers)
+            if max_age or etag or last_modified:
+                meta = {
+                    'etag': etag,
+                    'last_modified': last_modified,
+                    'encoding': response.encoding or response.apparent_encoding or 'utf-8',
+                    'stored': time.time(),
+                    'max_age': max_age,
+                }
+                self.store.put(url, meta, body=response.content)
+        return response.text, 'fetched'
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_json_atomic(path, data, indent=None):
+    """Write ``data`` to a temporary file next to ``path`` and swap it in, so readers never see a
+    half-written file."""
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent)
+    os.replace(temp_path, path)
+
+
+class DownloadManifest:
+    """Record of downloaded videos, keyed by video ID and format, kept in the output directory."""
+    
+    FILENAME = ".emporium_manifest.json"
+    
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, self.FILENAME)
+        self.lock = threading.Lock()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.videos = json.load(f).get('videos', {})
+        except (OSError, ValueError):
+            self.videos = {}
+    
+    def save(self):
+        write_json_atomic(self.path, {'videos': self.videos}, indent=1)
+    
+    def is_complete(self, video_id, fmt):
+        entry = self.videos.get(video_id, {}).get(fmt)
+        if not entry:
+            return False
+        
+        filepath = os.path.join(self.directory, entry['file'])
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return False
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime != entry['mtime']:
+            if file_sha256(filepath) != entry['sha256']:
+                return False
+            with self.lock:
+                entry['mtime'] = stat.st_mtime
+                self.save()
+        return True
+    
+    def record(self, video_id, fmt, filepath):
+        stat = os.stat(filepath)
+        entry = {
+            'file': os.path.relpath(filepath, self.directory),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': file_sha256(filepath),
+            'downloaded': time.time(),
+        }
+        with self.lock:
+            self.videos.setdefault(video_id, {})[fmt] = entry
+            self.save()
+
+
+def transcode_to_mp3(input_path, output_path, bitrate):
+    """Transcode an audio file to MP3. Runs in a worker process so encoding stays off the download threads."""
+    temp_path = os.path.splitext(output_path)[0] + '.part.mp3'
+    clip = mp.AudioFileClip(input_path)
+    try:
+        clip.write_audiofile(temp_path, codec='libmp3lame', bitrate=bitrate, logger=None)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        clip.close()
+    os.replace(temp_path, output_path)
+    os.remove(input_path)
+    return output_path
+
+
+class RangeNotSupported(Exception):
+    pass
+
+
+class SegmentedDownloader:
+    """Download a file over several connections by fetching byte ranges in parallel.
+
+    Data is written to ``<filepath>.part`` and every finished range is recorded in a
+    ``<filepath>.part.json`` journal, so an interrupted download resumes where it stopped.
+    Servers that ignore Range headers get a plain single-connection download instead.
+    """
+    
+    def __init__(self, connections=4, segment_size=8 * 1024 * 1024, timeout=30):
+        self.connections = connections
+        self.segment_size = segment_size
+        self.timeout = timeout
+        self.bytes_downloaded = 0
+        self.completed = []
+        self.lock = threading.Lock()
+    
+    def split_ranges(self, filesize):
+        return [(start, min(start + self.segment_size, filesize) - 1)
+                for start in range(0, filesize, self.segment_size)]
+    
+    def load_journal(self, part_path, journal_path, filesize, key):
+        if not (os.path.exists(part_path) and os.path.exists(journal_path)):
+            return []
+        try:
+            with open(journal_path, 'r', encoding='utf-8') as f:
+                journal = json.load(f)
+        except (OSError, ValueError):
+            return []
+        if (journal.get('key') != key or journal.get('filesize') != filesize
+                or journal.get('segment_size') != self.segment_size
+                or os.path.getsize(part_path) != filesize):
+            return []
+        return [tuple(r) for r in journal.get('completed', [])]
+    
+    def save_journal(self, journal_path, filesize, key):
+        write_json_atomic(journal_path, {
+            'key': key,
+            'filesize': filesize,
+            'segment_size': self.segment_size,
+            'completed': sorted(self.completed),
+        })
+    
+    def record_range(self, segment, journal_path, filesize, key):
+        with self.lock:
+            self.completed.append(segment)
+            self.save_journal(journal_path, filesize, key)
+    
+    def download(self, url, filepath, filesize, progress_callback=None, key=None):
+        part_path = filepath + '.part'
+        journal_path = part_path + '.json'
+        
+        self.completed = self.load_journal(part_path, journal_path, filesize, key)
+        if self.completed:
+            done = set(self.completed)
+            ranges = [r for r in self.split_ranges(filesize) if r not in done]
+        else:
+            ranges = self.split_ranges(filesize)
+            with open(part_path, 'wb') as f:
+                f.truncate(filesize)
+            self.save_journal(journal_path, filesize, key)
+        self.bytes_downloaded = sum(end - start + 1 for start, end in self.completed)
+        if progress_callback and self.bytes_downloaded:
+            progress_callback(self.bytes_downloaded)
+        
+        with requests.Session() as session:
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.connections)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            
+            try:
+                with ThreadPoolExecutor(max_workers=self.connections) as executor:
+                    futures = [executor.submit(self.fetch_range, session, url, part_path, start, end, progress_callback)
+                               for start, end in ranges]
+                    pending = set(futures)
+                    try:
+                        for future in as_completed(futures):
+                            pending.discard(future)
+                            self.record_range(future.result(), journal_path, filesize, key)
+                    except Exception:
+                        for future in pending:
+                            future.cancel()
+                        for future in pending:
+                            if not future.cancelled() and future.exception() is None:
+                                self.record_range(future.result(), journal_path, filesize, key)
+                        raise
+            except RangeNotSupported:
+                # the whole file is rewritten, so earlier ranges no longer count
+                with self.lock:
+                    self.completed = []
+                    self.save_journal(journal_path, filesize, key)
+                self.fetch_whole(session, url, part_path, progress_callback)
+        
+        actual_size = os.path.getsize(part_path)
+        if self.bytes_downloaded != filesize or actual_size != filesize:
+            raise Exception(f"Size mismatch for {os.path.basename(filepath)}: "
+                            f"expected {filesize} bytes, got {self.bytes_downloaded} ({actual_size} on disk)")
+        
+        os.replace(part_path, filepath)
+        os.remove(journal_path)
+        return filepath
+    
+    def fetch_range(self, session, url, filepath, start, end, progress_callback):
+        headers = {'Range': f'bytes={start}-{end}'}
+        written = 0
+        with session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise RangeNotSupported("Server does not support range requests")
+            
+            with open(filepath, 'r+b') as f:
+                f.seek(start)
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+                    written += len(chunk)
+                    with self.lock:
+                        self.bytes_downloaded += len(chunk)
+                        downloaded = self.bytes_downloaded
+                    if progress_callback:
+                        progress_callback(downloaded)
+        
+        if written != end - start + 1:
+            raise Exception(f"Segment {start}-{end} incomplete: got {written} of {end - start + 1} bytes")
+        return start, end
+    
+    def fetch_whole(self, session, url, filepath, progress_callback):
+        self.bytes_downloaded = 0
+        with session.get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            with open(filepath, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+                    self.bytes_downloaded += len(chunk)
+                    if progress_callback:
+                        progress_callback(self.bytes_downloaded)
+
+
+SCRAPE_PRESETS = {
+    "links": ("a", ["a"]),
+    "images": ("img", ["img"]),
+    "text": ("p, h1, h2, h3, h4, h5, h6", ["p", "h1", "h2", "h3", "h4", "h5", "h6"]),
+    "tables": ("table", ["table"]),
+}
+
+HTML_PARSERS = ["auto", "lxml", "html.parser"]
+
+
+def span_value(value, limit):
+    match = re.match(r'\s*(\d+)', value or '')
+    return min(max(int(match.group(1)), 1), limit) if match else 1
+
+
+def table_rows(table):
+    """Yield ``(row, in_thead)`` for the rows of ``table`` itself, without entering nested tables."""
+    for child in table.children:
+        name = getattr(child, 'name', None)
+        if name == 'tr':
+            yield child, False
+        elif name in ('thead', 'tbody', 'tfoot'):
+            for row in child.children:
+                if getattr(row, 'name', None) == 'tr':
+                    yield row, name == 'thead'
+
+
+def extract_table(table):
+    """Read an HTML table in one pass into ``{column name: [values]}``.
+
+    ``rowspan``/``colspan`` cells are copied into every slot they cover so the result is a full
+    rectangle. Leading rows that are in ``<thead>`` or made only of ``<th>`` cells name the columns
+    (several header rows are joined with " / "); otherwise columns are called col_1, col_2, ...
+    """
+    header_rows = []
+    rows = []
+    # column -> [rows still covered, text] for cells spanning down from earlier rows
+    pending = {}
+    for row, in_thead in table_rows(table):
+        values = []
+        spans = []
+        
+        def fill_spanned():
+            while len(values) in pending:
+                remaining, text = pending.pop(len(values))
+                if remaining > 1:
+                    spans.append((len(values), [remaining - 1, text]))
+                values.append(text)
+        
+        all_th = True
+        for cell in row.children:
+            name = getattr(cell, 'name', None)
+            if name not in ('td', 'th'):
+                continue
+            fill_spanned()
+            all_th = all_th and name == 'th'
+            # .string skips get_text's descendant walk for the common single-text-node cell
+            text = cell.string
+            text = text.strip() if text is not None else cell.get_text().strip()
+            attrs = cell.attrs
+            colspan = span_value(attrs['colspan'], 1000) if 'colspan' in attrs else 1
+            rowspan = span_value(attrs['rowspan'], 65534) if 'rowspan' in attrs else 1
+            for _ in range(colspan):
+                if rowspan > 1:
+                    spans.append((len(values), [rowspan - 1, text]))
+                values.append(text)
+        fill_spanned()
+        for key in sorted(pending):
+            if key not in pending:
+                # already filled in by fill_spanned() for an earlier gap
+                continue
+            if key < len(values):
+                # overlapped by a colspan in this row; the spanning cell still uses up the row
+                remaining, text = pending.pop(key)
+                if remaining > 1:
+                    spans.append((key, [remaining - 1, text]))
+                continue
+            values.extend([''] * (key - len(values)))
+            fill_spanned()
+        pending.update(spans)
+        
+        if not values:
+            continue
+        if not rows and (in_thead or all_th):
+            header_rows.append(values)
+        else:
+            rows.append(values)
+    
+    width = max((len(values) for values in header_rows + rows), default=0)
+    header = []
+    for i in range(width):
+        parts = []
+        for values in header_rows:
+            if i < len(values) and values[i] and values[i] not in parts:
+                parts.append(values[i])
+        name = ' / '.join(parts) or f"col_{i + 1}"
+        unique, counter = name, 2
+        while unique in header:
+            unique = f"{name}_{counter}"
+            counter += 1
+        header.append(unique)
+    
+    columns = {name: [] for name in header}
+    for values in rows:
+        values = values + [''] * (width - len(values))
+        for name, value in zip(header, values):
+            columns[name].append(value)
+    return columns
+
+
+def table_item_rows(item):
+    """Expand a tables-preset item into one dict per table row, for outputs that are row-based."""
+    extra = {key: value for key, value in item.items() if key not in ('header', 'row_count', 'columns')}
+    columns = item['columns']
+    for row_index in range(item['row_count']):
+        row = dict(extra, row_index=row_index + 1)
+        for name, values in columns.items():
+            row.setdefault(name, values[row_index])
+        yield row
+
+
+def make_soup(content, parser="auto", only_tags=None):
+    """Parse HTML with the fastest available backend, optionally keeping only the given tags."""
+    parse_only = SoupStrainer(only_tags) if only_tags else None
+    if parser == "auto":
+        parser = "lxml" if importlib.util.find_spec("lxml") is not None else "html.parser"
+    try:
+        return BeautifulSoup(content, parser, parse_only=parse_only)
+    except FeatureNotFound:
+        return BeautifulSoup(content, "html.parser", parse_only=parse_only)
+
+
+FOLLOW_MODES = ["all links", "next page", "selector"]
+
+
+def normalize_url(url):
+    """Canonical form of a URL for de-duplication: no fragment, lowercase scheme and host, no
+    default port, sorted query parameters and no trailing slash."""
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').lower()
+    if parsed.port and (scheme, parsed.port) not in (('http', 80), ('https', 443)):
+        host = f"{host}:{parsed.port}"
+    if parsed.username:
+        credentials = parsed.username + (f":{parsed.password}" if parsed.password else '')
+        host = f"{credentials}@{host}"
+    path = parsed.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, host, path, parsed.params, query, ''))
+
+
+class BloomFilter:
+    """Fixed-size set membership test. False positives happen at roughly ``error_rate`` once
+    ``capacity`` items are stored; false negatives never do."""
+    
+    def __init__(self, capacity, error_rate=0.0001):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+    
+    def positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+    
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self.positions(item))
+    
+    def add(self, item):
+        """Add ``item``; returns False if it was (probably) already present."""
+        added = False
+        for pos in self.positions(item):
+            if not self.bits[pos >> 3] & (1 << (pos & 7)):
+                self.bits[pos >> 3] |= 1 << (pos & 7)
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+
+class UrlFrontier:
+    """FIFO queue of URLs to crawl that admits each one at most once.
+
+    URLs are queued as given, so they are fetched and links on them resolved exactly as written;
+    only the duplicate check uses ``normalize_url``. Visited URLs are tracked in a Bloom filter, so
+    memory stays fixed however many links are seen; the price is that a small fraction of never-seen
+    URLs may be skipped as duplicates.
+    """
+    
+    def __init__(self, expected_urls=100000, error_rate=0.0001):
+        self.queue = deque()
+        self.visited = BloomFilter(expected_urls, error_rate)
+    
+    def add(self, url, depth=0):
+        if not self.visited.add(normalize_url(url)):
+            return False
+        self.queue.append((url, depth))
+        return True
+    
+    def pop(self):
+        return self.queue.popleft()
+    
+    def __len__(self):
+        return len(self.queue)
+
+
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+IMPLIED_END_TAGS = {'p', 'li', 'dt', 'dd', 'option', 'tr', 'td', 'th'}
+CLOSES_P_TAGS = {'address', 'article', 'aside', 'blockquote', 'details', 'div', 'dl', 'fieldset', 'figure',
+                 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'main', 'nav', 'ol',
+                 'p', 'pre', 'section', 'table', 'ul'}
+SIMPLE_SELECTOR = re.compile(r'^([\w-]+|\*)?((?:[.#][\w-]+)*)((?:\[[\w-]+(?:~?=(?:"[^"]*"|\'[^\']*\'|[^\]]*))?\])*)$')
+
+
+def parse_simple_selector(selector):
+    """Compile a comma-separated list of ``tag.class#id[attr=value]`` selectors into match tests.
+
+    Raises ValueError for anything needing more context (combinators, pseudo-classes).
+    """
+    tests = []
+    for part in selector.split(','):
+        match = SIMPLE_SELECTOR.match(part.strip())
+        if not part.strip() or not match:
+            raise ValueError(f"'{part.strip()}' is too complex for streaming mode")
+        tag, qualifiers, attr_tests = match.groups()
+        classes = re.findall(r'\.([\w-]+)', qualifiers)
+        ids = re.findall(r'#([\w-]+)', qualifiers)
+        attributes = []
+        for name, op, value in re.findall(r'\[([\w-]+)(?:(~?=)("[^"]*"|\'[^\']*\'|[^\]]*))?\]', attr_tests):
+            attributes.append((name.lower(), op, value.strip('"\'')))
+        tests.append(((tag or '*').lower(), classes, ids, attributes))
+    return tests
+
+
+def selector_matches(tests, tag, attrs):
+    for test_tag, classes, ids, attributes in tests:
+        if test_tag != '*' and test_tag != tag:
+            continue
+        element_classes = attrs.get('class', '').split()
+        if any(c not in element_classes for c in classes):
+            continue
+        if any(attrs.get('id') != i for i in ids):
+            continue
+        ok = True
+        for name, op, value in attributes:
+            actual = attrs.get(name)
+            if actual is None or (op == '=' and actual != value) or (op == '~=' and value not in actual.split()):
+                ok = False
+                break
+        if ok:
+            return True
+    return False
+
+
+class StreamedElement:
+    """The parts of a matched element the extractors use, in BeautifulSoup's shape."""
+    
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.text_parts = []
+        self.markup_parts = None
+    
+    def get(self, key, default=None):
+        if key == 'class':
+            return self.attrs['class'].split() if 'class' in self.attrs else default
+        return self.attrs.get(key, default)
+    
+    def get_text(self):
+        return ''.join(self.text_parts)
+    
+    @property
+    def markup(self):
+        return ''.join(self.markup_parts or [])
+
+
+class StreamingExtractor(HTMLParser):
+    """Incremental parser that calls ``on_element`` with each element matching a simple selector
+    as soon as its end tag arrives, then forgets it. Elements nested inside a match are not
+    reported separately. With ``keep_markup`` the element's source is kept for re-parsing."""
+    
+    def __init__(self, selector, on_element, keep_markup=False):
+        super().__init__(convert_charrefs=True)
+        self.tests = parse_simple_selector(selector)
+        self.on_element = on_element
+        self.keep_markup = keep_markup
+        self.current = None
+        # tags open inside the current match, and tags open outside any match (its ancestors)
+        self.open_tags = []
+        self.ancestors = []
+    
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: value or '' for name, value in attrs}
+        if self.current is not None:
+            if ((tag == self.current.name and not self.open_tags and tag in IMPLIED_END_TAGS)
+                    or (self.current.name == 'p' and tag in CLOSES_P_TAGS)):
+                self.finish()
+            else:
+                if self.keep_markup:
+                    self.current.markup_parts.append(self.get_starttag_text())
+                if tag not in VOID_TAGS:
+                    self.open_tags.append(tag)
+                return
+        
+        if selector_matches(self.tests, tag, attrs):
+            self.current = StreamedElement(tag, attrs)
+            if self.keep_markup:
+                self.current.markup_parts = [self.get_starttag_text()]
+            if tag in VOID_TAGS:
+                self.finish()
+        elif tag not in VOID_TAGS:
+            ancestors = self.ancestors
+            if ancestors and ((tag == ancestors[-1] and tag in IMPLIED_END_TAGS)
+                              or (ancestors[-1] == 'p' and tag in CLOSES_P_TAGS)):
+                ancestors.pop()
+            ancestors.append(tag)
+    
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if self.open_tags and self.open_tags[-1] == tag:
+            self.open_tags.pop()
+        elif self.current is not None and self.current.name == tag and not self.open_tags:
+            self.finish()
+        elif self.current is None and self.ancestors and self.ancestors[-1] == tag:
+            self.ancestors.pop()
+    
+    def handle_endtag(self, tag):
+        if self.current is not None:
+            if tag in self.open_tags:
+                if self.keep_markup:
+                    self.current.markup_parts.append(f"</{tag}>")
+                while self.open_tags.pop() != tag:
+                    pass
+                return
+            if tag == self.current.name:
+                if self.keep_markup:
+                    self.current.markup_parts.append(f"</{tag}>")
+                self.finish()
+                return
+            if tag not in self.ancestors:
+                # a stray end tag that closes nothing, as in "<b>bold</i>"; browsers ignore it too
+                return
+            # a parent closing implicitly ends the element
+            self.finish()
+        if tag in self.ancestors:
+            while self.ancestors.pop() != tag:
+                pass
+    
+    def handle_data(self, data):
+        if self.current is not None:
+            self.current.text_parts.append(data)
+            if self.keep_markup:
+                self.current.markup_parts.append(data.replace('&', '&amp;').replace('<', '&lt;'))
+    
+    def finish(self):
+        element = self.current
+        self.current = None
+        self.open_tags = []
+        self.on_element(element)
+    
+    def close(self):
+        super().close()
+        if self.current is not None:
+            self.finish()
+
+
+def stream_elements(session, url, selector, on_element, keep_markup=False, timeout=30, chunk_size=64 * 1024,
+                    stop_event=None):
+    """Download ``url`` in chunks and feed them to a ``StreamingExtractor`` so matches are reported
+    while the page is still arriving; returns the number of bytes read."""
+    extractor = StreamingExtractor(selector, on_element, keep_markup)
+    received = 0
+    with session.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        for chunk in response.iter_content(chunk_size):
+            if stop_event and stop_event.is_set():
+                raise Exception("Scrape stopped")
+            received += len(chunk)
+            extractor.feed(decoder.decode(chunk))
+        extractor.feed(decoder.decode(b'', final=True))
+    extractor.close()
+    return received
+
+
+class HostRateLimiter:
+    """Spaces out requests to the same host so they start at least ``delay`` seconds apart."""
+    
+    def __init__(self, delay):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.next_slot = {}
+    
+    def wait(self, url):
+        if self.delay <= 0:
+            return
+        host = urlparse(url).netloc.lower()
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, 0))
+            self.next_slot[host] = slot + self.delay
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class ScrapeDiffState:
+    """What the last run extracted from each page, so diff mode can report only what changed.
+
+    Items are matched by an identity (link URL, image source, table position, element id or text)
+    and compared by a fingerprint of their content. Links to follow are not stored: they depend on
+    the crawl settings, so an unchanged page is still parsed for them.
+    """
+    
+    IGNORED_FIELDS = ('index', 'page_url', 'change')
+    
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+    
+    def path_for(self, url, scrape_type, selector):
+        key = f"{scrape_type}\n{selector}\n{url}"
+        return self.directory / (hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+    
+    def load(self, url, scrape_type, selector):
+        try:
+            with open(self.path_for(url, scrape_type, selector), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def save(self, url, scrape_type, selector, state):
+        write_json_atomic(self.path_for(url, scrape_type, selector), state)
+    
+    def identity(self, item, scrape_type):
+        if scrape_type == "links":
+            return item['url']
+        if scrape_type == "images":
+            return item['src'] or item['srcset']
+        if scrape_type == "tables":
+            return str(item['table_index'])
+        return item.get('id') or item.get('text', '')
+    
+    def fingerprint(self, item):
+        content = {key: value for key, value in item.items() if key not in self.IGNORED_FIELDS}
+        return hashlib.sha256(json.dumps(content, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    
+    def diff(self, previous, items, scrape_type):
+        """Return ``(changes, current)``: the added/removed/changed items tagged with a 'change'
+        field, and the item map to store for the next run."""
+        current = {}
+        for item in items:
+            identity = self.identity(item, scrape_type)
+            key, occurrence = identity, 1
+            while key in current:
+                occurrence += 1
+                key = f"{identity}#{occurrence}"
+            current[key] = [self.fingerprint(item), item]
+        
+        old = previous.get('items', {}) if previous else {}
+        changes = []
+        for key, (fingerprint, item) in current.items():
+            if key not in old:
+                changes.append(dict(item, change='added'))
+            elif old[key][0] != fingerprint:
+                changes.append(dict(item, change='changed'))
+        for key, (fingerprint, item) in old.items():
+            if key not in current:
+                changes.append(dict(item, change='removed'))
+        return changes, current
+
+
+class Crawler:
+    """Breadth-first crawler that fetches pages concurrently over a pooled requests Session.
+
+    ``on_page(url, depth, content, status)`` is called for every fetched page on the crawling
+    thread, with the ``HttpCache`` status ('fetched' without a cache), and returns the links found
+    on it; those within ``max_depth`` (and on the same host, unless ``same_host`` is off) go into a
+    ``UrlFrontier`` until enough pages are queued to reach ``max_pages``. With ``record_times``,
+    ``fetch_times`` holds how long each page took to download until the caller pops it.
+    """
+    
+    def __init__(self, session=None, concurrency=4, delay=1.0, max_depth=0, max_pages=1,
+                 same_host=True, timeout=30, http_cache=None, record_times=False):
+        self.session = session or requests.Session()
+        self.http_cache = http_cache
+        adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.concurrency = concurrency
+        self.rate_limiter = HostRateLimiter(delay)
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.same_host = same_host
+        self.timeout = timeout
+        self.pages_requested = 0
+        self.pages_done = 0
+        self.record_times = record_times
+        self.fetch_times = {}
+        self.stop_event = threading.Event()
+    
+    def stop(self):
+        self.stop_event.set()
+    
+    def fetch(self, url):
+        self.rate_limiter.wait(url)
+        if self.stop_event.is_set():
+            raise Exception("Crawl stopped")
+        start = time.time()
+        try:
+            if self.http_cache:
+                return self.http_cache.fetch(self.session, url, self.timeout)
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.text, 'fetched'
+        finally:
+            if self.record_times:
+                self.fetch_times[url] = time.time() - start
+    
+    def crawl(self, start_urls, on_page, on_error=None):
+        start_hosts = {urlparse(normalize_url(url)).netloc for url in start_urls}
+        frontier = UrlFrontier(expected_urls=max(100000, self.max_pages * 50))
+        for url in start_urls:
+            frontier.add(url)
+        
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while frontier or in_flight:
+                while (frontier and len(in_flight) < self.concurrency
+                       and self.pages_requested < self.max_pages and not self.stop_event.is_set()):
+                    url, depth = frontier.pop()
+                    in_flight[executor.submit(self.fetch, url)] = (url, depth)
+                    self.pages_requested += 1
+                if not in_flight:
+                    break
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, depth = in_flight.pop(future)
+                    self.pages_done += 1
+                    try:
+                        links = on_page(url, depth, *future.result())
+                    except Exception as e:
+                        if on_error:
+                            on_error(url, e)
+                        continue
+                    
+                    if depth >= self.max_depth or self.pages_requested >= self.max_pages:
+                        continue
+                    for link in links or []:
+                        # enough pages are queued to reach max_pages, so the rest would never be fetched
+                        if len(frontier) + self.pages_requested >= self.max_pages:
+                            break
+                        parsed = urlparse(normalize_url(link))
+                        if parsed.scheme not in ('http', 'https'):
+                            continue
+                        if self.same_host and parsed.netloc not in start_hosts:
+                            continue
+                        frontier.add(link, depth + 1)
+        return self.pages_done
+
+
+def csv_value(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class NdjsonSink:
+    """Writes scraped items to disk one JSON object per line as they arrive."""
+    
+    def __init__(self, path, flush_every=500, flush_interval=2.0):
+        self.path = path
+        self.file = open(path, 'w', encoding='utf-8')
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.pending = 0
+        self.last_flush = time.time()
+        self.count = 0
+    
+    def write(self, item):
+        self.file.write(json.dumps(item, ensure_ascii=False))
+        self.file.write('\n')
+        self.count += 1
+        self.pending += 1
+        if self.pending >= self.flush_every or time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+    
+    def flush(self):
+        self.file.flush()
+        self.pending = 0
+        self.last_flush = time.time()
+    
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class CsvSink(NdjsonSink):
+    """Streams scraped items to CSV. The header grows when an item brings a new field; the rows
+    written so far are then copied once into a file with the wider header."""
+    
+    def __init__(self, path, flush_every=500, flush_interval=2.0):
+        super().__init__(path, flush_every, flush_interval)
+        self.file.close()
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.fieldnames = []
+        self.writer = None
+    
+    def write(self, item):
+        new_fields = [key for key in item if key not in self.fieldnames]
+        if new_fields:
+            self.widen_header(new_fields)
+        self.writer.writerow({key: csv_value(value) for key, value in item.items()})
+        self.count += 1
+        self.pending += 1
+        if self.pending >= self.flush_every or time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+    
+    def widen_header(self, new_fields):
+        old_fieldnames = self.fieldnames
+        self.fieldnames = old_fieldnames + new_fields
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames)
+            self.writer.writeheader()
+            return
+        
+        self.file.close()
+        temp_path = f"{self.path}.tmp"
+        with open(self.path, 'r', newline='', encoding='utf-8') as old_file, \
+                open(temp_path, 'w', newline='', encoding='utf-8') as new_file:
+            writer = csv.DictWriter(new_file, fieldnames=self.fieldnames)
+            writer.writeheader()
+            for row in csv.DictReader(old_file):
+                writer.writerow(row)
+        os.replace(temp_path, self.path)
+        
+        self.file = open(self.path, 'a', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames)
+        self.last_flush = time.time()
+        self.pending = 0
+
+
+def sql_name(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+class SqliteSink:
+    """Writes scraped items into an ``items`` table with batched inserts, one transaction per batch.
+
+    Columns are added as new fields show up. HTML tables are stored as their own ``table_N`` tables,
+    listed in ``scraped_tables`` with the page they came from.
+    """
+    
+    def __init__(self, path, flush_every=1000, flush_interval=2.0):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS scraped_tables (name TEXT PRIMARY KEY, page_url TEXT, table_index INTEGER, row_count INTEGER)")
+        # table -> {field name: column name}, and the casefolded column names in use
+        self.columns = {}
+        self.taken = {}
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.last_flush = time.time()
+        self.count = 0
+        self.table_count = 0
+    
+    def ensure_columns(self, table, names):
+        """Create ``table`` or add the columns it is missing; returns the column for each name.
+
+        SQLite column names are case-insensitive, so a name that differs from an existing column
+        only by case gets a ``_2`` suffix.
+        """
+        columns = self.columns.get(table)
+        created = columns is None
+        if created:
+            columns = self.columns[table] = {}
+            taken = self.taken[table] = set()
+        else:
+            taken = self.taken[table]
+        added = []
+        for name in names:
+            if name in columns:
+                continue
+            unique, counter = str(name), 2
+            while unique.casefold() in taken:
+                unique = f"{name}_{counter}"
+                counter += 1
+            taken.add(unique.casefold())
+            columns[name] = unique
+            added.append(unique)
+        if created:
+            if not added:
+                # SQLite needs at least one column
+                added = ["empty"]
+                taken.add("empty")
+            self.connection.execute(f"CREATE TABLE {sql_name(table)} ({', '.join(sql_name(n) for n in added)})")
+        else:
+            for column in added:
+                self.connection.execute(f"ALTER TABLE {sql_name(table)} ADD COLUMN {sql_name(column)}")
+        return [columns[name] for name in names]
+    
+    def write(self, item):
+        self.pending.append(item)
+        self.count += 1
+        if len(self.pending) >= self.flush_every or time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+    
+    def insert_rows(self, table, columns, rows):
+        placeholders = ', '.join('?' for _ in columns)
+        self.connection.executemany(
+            f"INSERT INTO {sql_name(table)} ({', '.join(sql_name(c) for c in columns)}) VALUES ({placeholders})", rows)
+    
+    def flush(self):
+        if self.pending:
+            with self.connection:
+                names = list(dict.fromkeys(key for item in self.pending for key in item))
+                self.insert_rows("items", self.ensure_columns("items", names),
+                                 [[csv_value(item.get(n)) for n in names] for item in self.pending])
+            self.pending = []
+        self.last_flush = time.time()
+    
+    def write_table(self, page_url, table_index, columns):
+        """Store one HTML table given as ``{column name: values}``; returns the SQL table name."""
+        self.table_count += 1
+        name = f"table_{self.table_count}"
+        header = list(columns)
+        row_count = len(columns[header[0]]) if header else 0
+        with self.connection:
+            sql_columns = self.ensure_columns(name, header)
+            if header:
+                self.insert_rows(name, sql_columns, zip(*columns.values()))
+            self.connection.execute("INSERT OR REPLACE INTO scraped_tables VALUES (?, ?, ?, ?)",
+                                    (name, page_url, table_index, row_count))
+        return name
+    
+    def close(self):
+        if self.connection is not None:
+            self.flush()
+            self.connection.close()
+            self.connection = None
+
+
+class ColumnarSink:
+    """Writes scraped items as Parquet or Arrow IPC files in batches using pyarrow.
+
+    Output is a directory: items go to ``part-NNNNN`` files (a new part starts when the schema
+    changes) and every HTML table gets its own ``table_N`` file.
+    """
+    
+    def __init__(self, path, file_format="parquet", batch_size=5000):
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.path = path
+        self.file_format = file_format
+        self.batch_size = batch_size
+        os.makedirs(path, exist_ok=True)
+        self.writer = None
+        self.schema = None
+        self.parts = 0
+        self.pending = []
+        self.count = 0
+        self.table_count = 0
+    
+    def column(self, values):
+        values = [csv_value(value) for value in values]
+        try:
+            return self.pa.array(values)
+        except (self.pa.ArrowInvalid, self.pa.ArrowTypeError):
+            return self.pa.array([None if value is None else str(value) for value in values])
+    
+    def build_table(self, columns, metadata=None):
+        arrays = [self.column(values) for values in columns.values()]
+        return self.pa.Table.from_arrays(arrays, names=[str(c) for c in columns], metadata=metadata)
+    
+    def open_writer(self, filepath, schema):
+        if self.file_format == "parquet":
+            return self.pa.parquet.ParquetWriter(filepath, schema)
+        return self.pa.ipc.new_file(filepath, schema)
+    
+    def write(self, item):
+        self.pending.append(item)
+        self.count += 1
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        if not self.pending:
+            return
+        names = dict.fromkeys(key for item in self.pending for key in item)
+        table = self.build_table({name: [item.get(name) for item in self.pending] for name in names})
+        self.pending = []
+        if self.writer is None or not table.schema.equals(self.schema):
+            if self.writer is not None:
+                self.writer.close()
+            filepath = os.path.join(self.path, f"part-{self.parts:05d}.{self.file_format}")
+            self.parts += 1
+            self.schema = table.schema
+            self.writer = self.open_writer(filepath, self.schema)
+        self.writer.write_table(table)
+    
+    def write_table(self, page_url, table_index, columns):
+        """Write one HTML table given as ``{column name: values}`` to its own file."""
+        table = self.build_table(columns, {'page_url': page_url, 'table_index': str(table_index)})
+        self.table_count += 1
+        name = f"table_{self.table_count}"
+        writer = self.open_writer(os.path.join(self.path, f"{name}.{self.file_format}"), table.schema)
+        writer.write_table(table)
+        writer.close()
+        return name
+    
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+STREAM_SINKS = {"ndjson": NdjsonSink, "csv": CsvSink, "sqlite": SqliteSink}
+if importlib.util.find_spec("pyarrow") is not None:
+    STREAM_SINKS["parquet"] = partial(ColumnarSink, file_format="parquet")
+    STREAM_SINKS["arrow"] = partial(ColumnarSink, file_format="arrow")
+
+
+def pick_srcset(srcset, width):
+    """Choose the ``srcset`` candidate closest to ``width`` pixels, preferring the next size up.
+
+    Density descriptors (``2x``) are treated as multiples of a 1000px base; a width of 0 picks the
+    largest candidate.
+    """
+    candidates = []
+    for candidate in srcset.split(','):
+        parts = candidate.split()
+        if not parts:
+            continue
+        size = 1000
+        if len(parts) > 1:
+            try:
+                if parts[1].endswith('w'):
+                    size = int(parts[1][:-1])
+                elif parts[1].endswith('x'):
+                    size = int(float(parts[1][:-1]) * 1000)
+            except ValueError:
+                pass
+        candidates.append((size, parts[0]))
+    if not candidates:
+        return None
+    candidates.sort()
+    if width:
+        for size, url in candidates:
+            if size >= width:
+                return url
+    return candidates[-1][1]
+
+
+class AssetDownloader:
+    """Downloads asset URLs in parallel over one pooled session, streaming each file to disk.
+
+    Files with identical content are stored once. ``.assets_manifest.json`` in the output directory
+    maps every finished URL to its file, so re-running a batch only fetches what is missing.
+    """
+    
+    MANIFEST = ".assets_manifest.json"
+    
+    def __init__(self, session, output_dir, workers=8, timeout=30, chunk_size=64 * 1024):
+        self.session = session
+        adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.output_dir = output_dir
+        self.workers = workers
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.manifest_path = os.path.join(output_dir, self.MANIFEST)
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        self.urls = manifest.get('urls', {})
+        self.hashes = manifest.get('hashes', {})
+        self.reserved = set()
+    
+    def stop(self):
+        self.stop_event.set()
+    
+    def save_manifest(self):
+        write_json_atomic(self.manifest_path, {'urls': self.urls, 'hashes': self.hashes}, indent=1)
+    
+    def is_done(self, url):
+        filename = self.urls.get(url)
+        return filename is not None and os.path.exists(os.path.join(self.output_dir, filename))
+    
+    def reserve_filename(self, url, content_type):
+        name = re.sub(r'[^\w.-]', '_', unquote(os.path.basename(urlparse(url).path))) or 'asset'
+        stem, ext = os.path.splitext(name)
+        if not ext:
+            ext = mimetypes.guess_extension((content_type or '').split(';')[0].strip()) or ''
+        stem = stem[:100]
+        candidate = stem + ext
+        counter = 1
+        while candidate in self.reserved or os.path.exists(os.path.join(self.output_dir, candidate)):
+            candidate = f"{stem}_{counter}{ext}"
+            counter += 1
+        self.reserved.add(candidate)
+        return candidate
+    
+    def download(self, url):
+        """Fetch one URL; returns ``(status, bytes_written)`` with status 'downloaded' or 'duplicate'."""
+        if self.stop_event.is_set():
+            raise Exception("Download stopped")
+        digest = hashlib.sha256()
+        size = 0
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            fd, temp_path = tempfile.mkstemp(dir=self.output_dir, suffix='.part')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in response.iter_content(self.chunk_size):
+                        if self.stop_event.is_set():
+                            raise Exception("Download stopped")
+                        f.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+                sha256 = digest.hexdigest()
+                
+                with self.lock:
+                    existing = self.hashes.get(sha256)
+                    if existing and os.path.exists(os.path.join(self.output_dir, existing)):
+                        self.urls[url] = existing
+                        os.remove(temp_path)
+                        return 'duplicate', size
+                    filename = self.reserve_filename(url, response.headers.get('Content-Type'))
+                    os.replace(temp_path, os.path.join(self.output_dir, filename))
+                    self.hashes[sha256] = filename
+                    self.urls[url] = filename
+                return 'downloaded', size
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+    
+    def run(self, urls, progress_callback=None, error_callback=None, total=None):
+        """Download every URL not already in the manifest and return a summary dict.
+
+        ``urls`` may be any iterable (``total`` is then its length for progress reporting, if known);
+        it is read as downloads finish, so only a few batches of URLs are queued at once.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        if total is None:
+            urls = list(dict.fromkeys(urls))
+            total = len(urls)
+        stats = {'downloaded': 0, 'duplicate': 0, 'skipped': 0, 'failed': 0, 'bytes': 0}
+        seen = set()
+        in_flight = {}
+        done = 0
+        
+        def finish(future):
+            nonlocal done
+            url = in_flight.pop(future)
+            done += 1
+            try:
+                status, size = future.result()
+                stats[status] += 1
+                stats['bytes'] += size
+            except Exception as e:
+                stats['failed'] += 1
+                if error_callback:
+                    error_callback(url, e)
+            if done % 50 == 0:
+                with self.lock:
+                    self.save_manifest()
+            if progress_callback:
+                progress_callback(done, max(total, done))
+        
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for url in urls:
+                if url in seen:
+                    continue
+                seen.add(url)
+                if self.is_done(url):
+                    stats['skipped'] += 1
+                    done += 1
+                    continue
+                in_flight[executor.submit(self.download, url)] = url
+                if len(in_flight) >= self.workers * 4:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        finish(future)
+            for future in as_completed(list(in_flight)):
+                finish(future)
+        
+        with self.lock:
+            self.save_manifest()
+        stats['seconds'] = time.time() - start
+        stats['throughput'] = stats['bytes'] / stats['seconds'] if stats['seconds'] > 0 else 0
+        return stats
+
+
+def natural_sort_key(name):
+    """Sort key that orders the digit runs in a file name by value, so ``2.pdf`` comes before
+    ``10.pdf`` and ``part 9`` before ``part 10``."""
+    parts = re.split(r'(\d+)', name.casefold())
+    return [int(part) if i % 2 else part for i, part in enumerate(parts)], name
+
+
+def scan_pdf(path):
+    """Open a PDF and touch every page and its content streams. Runs in a worker process so a merge
+    can be planned, and broken or encrypted inputs set aside, before any output is written."""
+    result = {'path': path, 'pages': 0, 'error': None}
+    try:
+        result['size'] = os.path.getsize(path)
+        with open(path, 'rb') as handle:
+            reader = PdfReader(handle)
+            if reader.is_encrypted and not reader.decrypt(''):
+                result['error'] = "encrypted"
+                return result
+            for page in reader.pages:
+                contents = page.get('/Contents')
+                if contents is not None:
+                    for stream in (contents if isinstance(contents, ArrayObject) else [contents]):
+                        stream.get_object()
+                reader.resolved_objects.clear()
+                result['pages'] += 1
+        result['sha256'] = file_sha256(path)
+    except Exception as e:
+        result['error'] = f"damaged ({str(e) or type(e).__name__})"
+        result['pages'] = 0
+    return result
+
+
+class StreamingPdfMerger:
+    """Merges PDFs by copying each page and the objects it uses straight into the output file.
+
+    Only one input is open at a time and its parsed objects are dropped after every page, so memory
+    depends on the largest single page rather than the total size of the merge. Objects 1 and 2 are
+    reserved for the catalog and page tree, which are written with a classic xref table on close().
+    Stream data is copied without being decoded.
+    
+    Given ``previous`` (the ``state()`` of an earlier merge into the same file), pages are appended
+    to that file as a PDF incremental update instead: new objects, a new page tree object and an
+    xref section chained to the old one with /Prev.
+    
+    With ``dedup`` on, stream objects (fonts, images, ICC profiles, ...) are identified by a hash of
+    their data and dictionary, and a stream already in the output is referenced instead of copied.
+    
+    Bookmarks are copied and each input's top-level ones are chained after the previous input's.
+    Other catalog entries (form fields, named destinations, attachments) are not carried over; they
+    are listed in ``dropped_features`` after each append().
+    """
+    
+    CATALOG = 1
+    PAGES = 2
+    
+    def __init__(self, output_path, previous=None, dedup=False):
+        self.output_path = output_path
+        self.previous = previous
+        self.dedup = dedup
+        self.stream_numbers = {}
+        self.content_keys = {}
+        self.duplicate_streams = 0
+        self.bytes_saved = 0
+        self.xref_offset = None
+        self.free_head = 0
+        self.dropped_features = []
+        # the merged outline root, its first top-level bookmark and the last one, which is held back
+        # as (number, dictionary) until the next input's bookmarks are linked after it
+        self.outlines = None
+        self.outline_first = None
+        self.outline_tail = None
+        self.outline_count = 0
+        self.outlines_changed = False
+        if previous:
+            if previous.get('outlines'):
+                with open(output_path, 'rb') as handle:
+                    tail = PdfReader(handle).get_object(previous['outline_last'])
+                self.outlines = previous['outlines']
+                self.outline_first = previous['outline_first']
+                self.outline_tail = (previous['outline_last'], tail)
+                self.outline_count = previous['outline_count']
+            self.file = open(output_path, 'r+b')
+            self.original_size = self.file.seek(0, os.SEEK_END)
+            self.offsets = array('Q', [0]) * previous['size']
+            self.page_numbers = array('L', previous['page_objects'])
+        else:
+            self.file = open(output_path, 'wb')
+            self.file.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+            self.offsets = array('Q', [0, 0, 0])
+            self.page_numbers = array('L')
+    
+    def new_object_number(self):
+        self.offsets.append(0)
+        return len(self.offsets) - 1
+    
+    def write_object(self, number, obj):
+        if obj is None:
+            # a reference to an object missing from the input
+            obj = NullObject()
+        self.offsets[number] = self.file.tell()
+        self.file.write(f"{number} 0 obj\n".encode('ascii'))
+        obj.write_to_stream(self.file, None)
+        self.file.write(b"\nendobj\n")
+    
+    def copy_object(self, obj, numbers, queue):
+        """Copy ``obj`` with every reference renumbered for the output, queueing referenced
+        objects that have not been given a number yet."""
+        if isinstance(obj, IndirectObject):
+            key = (obj.idnum, obj.generation)
+            number = numbers.get(key)
+            if number is None and self.dedup and isinstance(obj.get_object(), StreamObject):
+                digest = self.content_key(obj, frozenset())
+                if digest is not None and digest in self.stream_numbers:
+                    number = numbers[key] = self.stream_numbers[digest]
+                    self.duplicate_streams += 1
+                    self.bytes_saved += len(obj.get_object()._data)
+                elif digest is not None:
+                    number = numbers[key] = self.new_object_number()
+                    self.stream_numbers[digest] = number
+                    queue.append((obj, number))
+            if number is None:
+                number = numbers[key] = self.new_object_number()
+                queue.append((obj, number))
+            return IndirectObject(number, 0, None)
+        if isinstance(obj, StreamObject):
+            copy = StreamObject()
+            copy._data = obj._data
+            for key, value in obj.items():
+                if key != '/Length':
+                    copy[NameObject(key)] = self.copy_object(value, numbers, queue)
+            return copy
+        if isinstance(obj, DictionaryObject):
+            copy = DictionaryObject()
+            for key, value in obj.items():
+                copy[NameObject(key)] = self.copy_object(value, numbers, queue)
+            return copy
+        if isinstance(obj, ArrayObject):
+            return ArrayObject([self.copy_object(value, numbers, queue) for value in obj])
+        return obj
+    
+    def content_key(self, obj, visiting):
+        """Digest of ``obj`` and everything it references, or None for objects that can't be
+        compared by content (reference cycles, links back into the page tree)."""
+        if isinstance(obj, IndirectObject):
+            key = (obj.idnum, obj.generation)
+            if key in visiting:
+                return None
+            if key not in self.content_keys:
+                self.content_keys[key] = self.content_key(obj.get_object(), visiting | {key})
+            return self.content_keys[key]
+        
+        digest = hashlib.sha256(type(obj).__name__.encode('ascii'))
+        if isinstance(obj, DictionaryObject):
+            for key in sorted(obj):
+                if key in ('/Parent', '/P'):
+                    return None
+                if key == '/Length' and isinstance(obj, StreamObject):
+                    continue
+                value = self.content_key(obj.raw_get(key), visiting)
+                if value is None:
+                    return None
+                digest.update(key.encode('utf-8', 'replace') + value)
+            if isinstance(obj, StreamObject):
+                digest.update(obj._data)
+        elif isinstance(obj, ArrayObject):
+            for value in obj:
+                value = self.content_key(value, visiting)
+                if value is None:
+                    return None
+                digest.update(value)
+        else:
+            buffer = io.BytesIO()
+            obj.write_to_stream(buffer, None)
+            digest.update(buffer.getvalue())
+        return digest.digest()
+    
+    def open_reader(self, handle, password=None):
+        reader = PdfReader(handle)
+        if reader.is_encrypted and not reader.decrypt(password or ''):
+            raise Exception("File is encrypted")
+        return reader
+    
+    def append(self, path, password=None, page_callback=None):
+        """Copy every page of ``path`` to the output; returns the number of pages added.
+
+        If the input fails partway, its pages are left out of the page tree and the error is raised.
+        """
+        first_page = len(self.page_numbers)
+        known_streams = len(self.stream_numbers)
+        dedup_counts = (self.duplicate_streams, self.bytes_saved)
+        try:
+            return self.copy_pages(path, password, page_callback)
+        except Exception:
+            del self.page_numbers[first_page:]
+            self.forget_streams(known_streams, dedup_counts)
+            raise
+    
+    def forget_streams(self, known_streams, dedup_counts):
+        # streams of a failed copy may never have been written, so later inputs can't share them
+        for digest in list(self.stream_numbers)[known_streams:]:
+            del self.stream_numbers[digest]
+        self.duplicate_streams, self.bytes_saved = dedup_counts
+    
+    def copy_pages(self, path, password, page_callback):
+        with open(path, 'rb') as handle:
+            reader = self.open_reader(handle, password)
+            numbers = {}
+            self.content_keys = {}
+            root = reader.trailer.raw_get('/Root')
+            numbers[(root.idnum, root.generation)] = self.CATALOG
+            catalog = root.get_object()
+            names = catalog['/Names'] if '/Names' in catalog else None
+            names = names if isinstance(names, DictionaryObject) else {}
+            self.dropped_features = []
+            if '/AcroForm' in catalog:
+                self.dropped_features.append("form fields")
+            if '/Dests' in catalog or '/Dests' in names:
+                self.dropped_features.append("named destinations")
+            if '/EmbeddedFiles' in names:
+                self.dropped_features.append("attachments")
+            # references to the input's page tree point at the merged one instead
+            page_tree = [root.get_object().raw_get('/Pages')]
+            while page_tree:
+                node = page_tree.pop()
+                numbers[(node.idnum, node.generation)] = self.PAGES
+                for kid in node.get_object().get('/Kids', []):
+                    if isinstance(kid, IndirectObject) and kid.get_object().get('/Type') == '/Pages':
+                        page_tree.append(kid)
+            
+            pages = list(reader.pages)
+            for page in pages:
+                ref = page.indirect_reference
+                numbers[(ref.idnum, ref.generation)] = self.new_object_number()
+            
+            for page in pages:
+                ref = page.indirect_reference
+                number = numbers[(ref.idnum, ref.generation)]
+                queue = deque()
+                copy = self.copy_object(page, numbers, queue)
+                copy[NameObject('/Parent')] = IndirectObject(self.PAGES, 0, None)
+                self.write_object(number, copy)
+                while queue:
+                    old_ref, new_number = queue.popleft()
+                    self.write_object(new_number, self.copy_object(old_ref.get_object(), numbers, queue))
+                self.page_numbers.append(number)
+                reader.resolved_objects.clear()
+                if page_callback:
+                    page_callback()
+            
+            # the pages are in, so damaged bookmarks only cost the bookmarks
+            known_streams = len(self.stream_numbers)
+            dedup_counts = (self.duplicate_streams, self.bytes_saved)
+            try:
+                self.copy_outlines(catalog, numbers)
+            except Exception:
+                self.forget_streams(known_streams, dedup_counts)
+                self.dropped_features.append("bookmarks")
+            return len(pages)
+    
+    def copy_outlines(self, catalog, numbers):
+        """Copy the input's bookmarks, linking its top-level ones after those already in the output.
+        Nothing is linked until every bookmark is written, so a failure leaves the output's as they were."""
+        outlines = catalog.raw_get('/Outlines') if '/Outlines' in catalog else None
+        if not isinstance(outlines, IndirectObject) or '/First' not in outlines.get_object():
+            return
+        first = outlines.get_object().raw_get('/First')
+        top_level = 0
+        item, seen = first, set()
+        while isinstance(item, IndirectObject) and (item.idnum, item.generation) not in seen:
+            last_key = (item.idnum, item.generation)
+            seen.add(last_key)
+            top_level += 1
+            item = item.get_object()
+            item = item.raw_get('/Next') if '/Next' in item else None
+        count = outlines.get_object().get('/Count')
+        count = count if isinstance(count, int) and count > 0 else top_level
+        
+        if self.outlines is None:
+            self.outlines = self.new_object_number()
+        # top-level bookmarks name the merged outline root as their parent
+        numbers[(outlines.idnum, outlines.generation)] = self.outlines
+        queue = deque()
+        first_number = self.copy_object(first, numbers, queue).idnum
+        tail = None
+        while queue:
+            old_ref, number = queue.popleft()
+            copy = self.copy_object(old_ref.get_object(), numbers, queue)
+            if number == first_number and self.outline_tail:
+                copy[NameObject('/Prev')] = IndirectObject(self.outline_tail[0], 0, None)
+            if (old_ref.idnum, old_ref.generation) == last_key:
+                tail = (number, copy)
+            else:
+                self.write_object(number, copy)
+        if tail is None:
+            raise Exception("Bookmark list does not end")
+        
+        if self.outline_tail:
+            number, previous_tail = self.outline_tail
+            previous_tail[NameObject('/Next')] = IndirectObject(first_number, 0, None)
+            self.write_object(number, previous_tail)
+        else:
+            self.outline_first = first_number
+        self.outline_tail = tail
+        self.outline_count += count
+        self.outlines_changed = True
+    
+    def close(self):
+        pages = DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject([IndirectObject(n, 0, None) for n in self.page_numbers]),
+            NameObject('/Count'): NumberObject(len(self.page_numbers)),
+        })
+        self.write_object(self.PAGES, pages)
+        catalog = DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): IndirectObject(self.PAGES, 0, None),
+        })
+        if self.outline_first is not None:
+            catalog[NameObject('/Outlines')] = IndirectObject(self.outlines, 0, None)
+        if self.outlines_changed:
+            self.write_object(self.outline_tail[0], self.outline_tail[1])
+            self.write_object(self.outlines, DictionaryObject({
+                NameObject('/Type'): NameObject('/Outlines'),
+                NameObject('/First'): IndirectObject(self.outline_first, 0, None),
+                NameObject('/Last'): IndirectObject(self.outline_tail[0], 0, None),
+                NameObject('/Count'): NumberObject(self.outline_count),
+            }))
+        if not self.previous or self.outlines_changed:
+            self.write_object(self.CATALOG, catalog)
+        
+        # numbers reserved for objects that were never written (pages and resources of an input that
+        # failed partway) go on the free list instead of pointing at byte 0
+        first_new = self.previous['size'] if self.previous else 1
+        free = [n for n in range(first_new, len(self.offsets)) if not self.offsets[n]]
+        self.free_head = self.previous.get('free_head', 0) if self.previous else 0
+        next_free = {}
+        for number in reversed(free):
+            next_free[number] = self.free_head
+            self.free_head = number
+        
+        self.xref_offset = self.file.tell()
+        self.file.write(b"xref\n")
+        if self.previous:
+            # the earlier objects rewritten by this update: the page tree, and the catalog and
+            # bookmarks when bookmarks were added
+            sections = [(n, 1) for n in range(1, first_new) if self.offsets[n]]
+            sections.append((first_new, len(self.offsets) - first_new))
+            if free:
+                sections.insert(0, (0, 1))
+            prev = f" /Prev {self.previous['xref_offset']}"
+        else:
+            sections = [(0, len(self.offsets))]
+            prev = ""
+        for start, count in sections:
+            if not count:
+                continue
+            self.file.write(f"{start} {count}\n".encode('ascii'))
+            for number in range(start, start + count):
+                if number == 0:
+                    self.file.write(f"{self.free_head:010d} 65535 f \n".encode('ascii'))
+                elif number in next_free:
+                    self.file.write(f"{next_free[number]:010d} 00001 f \n".encode('ascii'))
+                else:
+                    self.file.write(f"{self.offsets[number]:010d} 00000 n \n".encode('ascii'))
+        self.file.write(f"trailer\n<< /Size {len(self.offsets)} /Root {self.CATALOG} 0 R{prev} >>\n"
+                        f"startxref\n{self.xref_offset}\n%%EOF\n".encode('ascii'))
+        self.file.close()
+    
+    def state(self):
+        """What a later incremental update needs to know about the finished output."""
+        state = {'size': len(self.offsets), 'xref_offset': self.xref_offset, 'free_head': self.free_head,
+                 'page_objects': list(self.page_numbers)}
+        if self.outline_first is not None:
+            state.update(outlines=self.outlines, outline_first=self.outline_first,
+                         outline_last=self.outline_tail[0], outline_count=self.outline_count)
+        return state
+    
+    def abort(self):
+        if self.previous:
+            self.file.truncate(self.original_size)
+            self.file.close()
+            return
+        self.file.close()
+        try:
+            os.remove(self.output_path)
+        except OSError:
+            pass
+
+
+def merge_pdf_group(paths, output_path, dedup=False):
+    """Scan and merge ``paths`` into ``output_path`` in one go. Runs in a worker process for batch
+    merges, so it only returns plain data for the caller to log and record in the manifest."""
+    result = {'output': output_path, 'merged': [], 'bad_files': [], 'dropped': [], 'pages': 0, 'state': None,
+              'duplicate_streams': 0, 'bytes_saved': 0}
+    merger = StreamingPdfMerger(output_path + '.part', dedup=dedup)
+    try:
+        for path in paths:
+            scan = scan_pdf(path)
+            if scan['error'] or scan['pages'] == 0:
+                result['bad_files'].append((path, scan['error'] or "no pages"))
+                continue
+            try:
+                merger.append(path)
+            except Exception as e:
+                result['bad_files'].append((path, f"damaged ({str(e)})"))
+                continue
+            result['merged'].append((path, scan['sha256']))
+            if merger.dropped_features:
+                result['dropped'].append((path, merger.dropped_features))
+        if not result['merged']:
+            merger.abort()
+            return result
+        merger.close()
+    except BaseException:
+        merger.abort()
+        raise
+    os.replace(output_path + '.part', output_path)
+    result.update(pages=len(merger.page_numbers), state=merger.state(),
+                  duplicate_streams=merger.duplicate_streams, bytes_saved=merger.bytes_saved)
+    return result
+
 
 class YouTubeConverter:
-    def __init__(self, parent_frame):
+    def __init__(self, parent_frame, dispatcher):
         self.parent_frame = parent_frame
+        self.dispatcher = dispatcher
         self.setup_ui()
         self.download_thread = None
+        self.info_thread = None
+        self.info_cancel = threading.Event()
+        self.playlist_listing = None
+        self.listing_page_size = 25
+        self.max_retries = 2
+        self.segmented_threshold = 16 * 1024 * 1024
+        self.video_progress = {}
+        self.batch_start = None
+        self.transcode_pool = None
+        self.transcode_futures = {}
+        self.manifest = None
+        self.metadata_ttl = 6 * 60 * 60
+        self.playlist_ttl = 60 * 60
+        self.metadata_cache = DiskCache(APP_DATA_DIR / "metadata", ttl=self.metadata_ttl,
+                                        max_bytes=20 * 1024 * 1024)
         
     def setup_ui(self):
 
@@ -121,6 +2082,9 @@ class YouTubeConverter:
                                          values=["1080p", "720p", "480p", "360p", "240p"], 
                                          state="readonly", width=10)
         self.quality_combo.grid(row=2, column=1, sticky=tk.W, pady=5)
+        self.adaptive_var = tk.BooleanVar(value=True)
+        self.adaptive_check = ttk.Checkbutton(main_frame, text="Adaptive streams (best quality)", variable=self.adaptive_var)
+        self.adaptive_check.grid(row=2, column=2, sticky=tk.W, pady=5)
         
         ttk.Label(main_frame, text="Audio Quality:").grid(row=3, column=0, sticky=tk.W, pady=5)
         self.audio_quality_var = tk.StringVar(value="128kbps")
@@ -134,19 +2098,49 @@ class YouTubeConverter:
         ttk.Entry(main_frame, textvariable=self.output_dir_var, width=40).grid(row=4, column=1, sticky=(tk.W, tk.E), pady=5)
         ttk.Button(main_frame, text="Browse", command=self.browse_directory).grid(row=4, column=2, pady=5)
         
+        ttk.Label(main_frame, text="Playlist Workers:").grid(row=5, column=0, sticky=tk.W, pady=5)
+        self.workers_var = tk.StringVar(value="4")
+        ttk.Spinbox(main_frame, from_=1, to=16, textvariable=self.workers_var, width=8).grid(row=5, column=1, sticky=tk.W, pady=5)
+        self.sync_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(main_frame, text="Sync mode (skip already downloaded)", variable=self.sync_var).grid(row=5, column=2, sticky=tk.W, pady=5)
+        
+        ttk.Label(main_frame, text="Connections per Video:").grid(row=6, column=0, sticky=tk.W, pady=5)
+        self.connections_var = tk.StringVar(value="4")
+        ttk.Spinbox(main_frame, from_=1, to=16, textvariable=self.connections_var, width=8).grid(row=6, column=1, sticky=tk.W, pady=5)
+        
         button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=5, column=0, columnspan=3, pady=10)
+        button_frame.grid(row=7, column=0, columnspan=3, pady=10)
         
         ttk.Button(button_frame, text="Get Video Info", command=self.get_video_info).pack(side=tk.LEFT, padx=5)
+        self.more_button = ttk.Button(button_frame, text="More Videos", command=self.show_more_videos, state="disabled")
+        self.more_button.pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Cancel Info", command=self.cancel_video_info).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Download", command=self.start_download).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Clear", command=self.clear_fields).pack(side=tk.LEFT, padx=5)
         
         self.progress_var = tk.DoubleVar()
         self.progress_bar = ttk.Progressbar(main_frame, variable=self.progress_var, maximum=100)
-        self.progress_bar.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
+        self.progress_bar.grid(row=8, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
+        
+        self.eta_var = tk.StringVar()
+        ttk.Label(main_frame, textvariable=self.eta_var).grid(row=9, column=0, columnspan=3, sticky=tk.W, pady=(0, 5))
+        
+        self.status_tree = ttk.Treeview(main_frame, columns=("number", "title", "length", "progress", "status"),
+                                        show="headings", height=6)
+        self.status_tree.heading("number", text="#")
+        self.status_tree.heading("title", text="Video")
+        self.status_tree.heading("length", text="Length")
+        self.status_tree.heading("progress", text="Progress")
+        self.status_tree.heading("status", text="Status")
+        self.status_tree.column("number", width=40, anchor=tk.E, stretch=False)
+        self.status_tree.column("title", width=320)
+        self.status_tree.column("length", width=60, anchor=tk.E, stretch=False)
+        self.status_tree.column("progress", width=80, anchor=tk.E, stretch=False)
+        self.status_tree.column("status", width=140, stretch=False)
+        self.status_tree.grid(row=10, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
         
         self.info_text = scrolledtext.ScrolledText(main_frame, height=10, width=70)
-        self.info_text.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
+        self.info_text.grid(row=11, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
         
         main_frame.columnconfigure(1, weight=1)
         self.parent_frame.rowconfigure(0, weight=1)
@@ -157,9 +2151,11 @@ class YouTubeConverter:
     def on_format_change(self, event=None):
         if self.format_var.get() == "mp3":
             self.quality_combo.config(state="disabled")
+            self.adaptive_check.config(state="disabled")
             self.audio_combo.config(state="readonly")
         else:
             self.quality_combo.config(state="readonly")
+            self.adaptive_check.config(state="normal")
             self.audio_combo.config(state="disabled")
     
     def browse_directory(self):
@@ -168,63 +2164,139 @@ class YouTubeConverter:
             self.output_dir_var.set(directory)
     
     def log_message(self, message):
-        self.info_text.insert(tk.END, message + "\n")
-        self.info_text.see(tk.END)
-        self.info_text.update()
+        self.dispatcher.log(self.info_text, message)
+    
+    def set_progress(self, value):
+        self.dispatcher.set_var(self.progress_var, value)
     
     def clear_fields(self):
         self.url_var.set("")
         self.info_text.delete(1.0, tk.END)
         self.progress_var.set(0)
+        self.eta_var.set("")
+        self.status_tree.delete(*self.status_tree.get_children())
+        self.playlist_listing = None
+        self.more_button.config(state="disabled")
+    
+    def format_length(self, length):
+        return f"{(length // 60) if length else 0}:{(length % 60) if length else 0:02d}"
     
     def get_video_info(self):
         url = self.url_var.get().strip()
         if not url:
             messagebox.showerror("Error", "Please enter a YouTube URL")
             return
+        if self.info_thread and self.info_thread.is_alive():
+            messagebox.showwarning("Warning", "Video info is already being fetched")
+            return
+        if self.download_thread and self.download_thread.is_alive():
+            messagebox.showwarning("Warning", "Download in progress")
+            return
+        
+        self.info_cancel.clear()
+        self.info_thread = threading.Thread(target=self.fetch_video_info, args=(url,))
+        self.info_thread.daemon = True
+        self.info_thread.start()
+    
+    def show_more_videos(self):
+        if not self.playlist_listing or (self.info_thread and self.info_thread.is_alive()):
+            return
+        
+        self.info_cancel.clear()
+        self.info_thread = threading.Thread(target=self.load_playlist_page)
+        self.info_thread.daemon = True
+        self.info_thread.start()
+    
+    def cancel_video_info(self):
+        if self.info_thread and self.info_thread.is_alive():
+            self.info_cancel.set()
+            self.log_message("Cancelling video info lookup...")
+    
+    def load_playlist_page(self):
+        listing = self.playlist_listing
+        start = listing['shown']
+        page_urls = listing['video_urls'][start:start + self.listing_page_size]
+        listing['shown'] = start + len(page_urls)
+        self.dispatcher.call(self.more_button.config, state="disabled")
+        
+        for i, video_url in enumerate(page_urls, start):
+            self.dispatcher.call(self.status_tree.insert, "", tk.END, iid=str(i), values=(i + 1, video_url, "", "", "Loading"))
+        
+        with ThreadPoolExecutor(max_workers=self.get_worker_count()) as executor:
+            futures = {executor.submit(self.get_video_metadata, video_url): str(i)
+                       for i, video_url in enumerate(page_urls, start)}
+            for future in as_completed(futures):
+                if self.info_cancel.is_set():
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                item_id = futures[future]
+                try:
+                    metadata = future.result()
+                    self.set_tree_cell(item_id, "title", metadata['title'] or "Unknown")
+                    self.set_tree_cell(item_id, "length", self.format_length(metadata['length']))
+                    self.set_tree_cell(item_id, "status", "Ready")
+                except Exception as e:
+                    self.set_tree_cell(item_id, "status", "Error")
+                    self.log_message(f"Could not load info for video {int(item_id) + 1}: {str(e)}")
+        
+        if self.info_cancel.is_set():
+            for future, item_id in futures.items():
+                if future.cancelled():
+                    self.set_tree_cell(item_id, "status", "Cancelled")
+            self.log_message("Video info lookup cancelled")
         
+        self.log_message(f"Showing {listing['shown']} of {len(listing['video_urls'])} videos")
+        if listing['shown'] < len(listing['video_urls']):
+            self.dispatcher.call(self.more_button.config, state="normal")
+    
+    def fetch_video_info(self, url):
         try:
             self.log_message("Fetching video information...")
             if "playlist" in url:
-                playlist = Playlist(url)
-                self.log_message(f"Playlist Title: {playlist.title}")
-                self.log_message(f"Number of videos: {len(playlist.video_urls)}")
-                self.log_message("\nVideos in playlist:")
-                for video in playlist.videos:
-                    self.log_message(f"- {video.title}")
+                playlist = self.get_playlist_metadata(url)
+                self.log_message(f"Playlist Title: {playlist['title']}")
+                self.log_message(f"Number of videos: {len(playlist['video_urls'])}")
+                self.dispatcher.call(self.clear_status_tree)
+                self.playlist_listing = {'video_urls': playlist['video_urls'], 'shown': 0}
+                self.load_playlist_page()
             else:
-                yt = YouTube(url)
-                
-                info = f"Title: {yt.title or 'Unknown'}\n"
-                info += f"Author: {yt.author or 'Unknown'}\n"
-                info += f"Length: {(yt.length // 60) if yt.length else 0}:{(yt.length % 60) if yt.length else 0:02d}\n"
-                info += f"Views: {yt.views:,}\n" if yt.views else "Views: Unknown\n"
+                metadata = self.get_video_metadata(url)
+                streams = self.load_streams(metadata)
                 
-                try:
-                    info += f"Rating: {yt.rating:.2f}\n\n" if yt.rating else "Rating: Unknown\n\n"
-                except:
-                    info += "Rating: Unknown\n\n"
+                info = f"Title: {metadata['title'] or 'Unknown'}\n"
+                info += f"Author: {metadata['author'] or 'Unknown'}\n"
+                info += f"Length: {self.format_length(metadata['length'])}\n"
+                info += f"Views: {metadata['views']:,}\n" if metadata['views'] else "Views: Unknown\n"
+                info += f"Rating: {metadata['rating']:.2f}\n\n" if metadata['rating'] else "Rating: Unknown\n\n"
                 
                 info += "Available Video Streams:\n"
-                video_streams = yt.streams.filter(progressive=True, file_extension='mp4')
+                video_streams = self.progressive_streams(streams)
                 if video_streams:
                     for stream in video_streams:
-                        try:
-                            size_mb = stream.filesize // 1024 // 1024 if stream.filesize else 0
-                            info += f"  - {stream.resolution or 'Unknown'} MP4 ({size_mb} MB)\n"
-                        except:
+                        if stream.filesize:
+                            info += f"  - {stream.resolution or 'Unknown'} MP4 ({stream.filesize // 1024 // 1024} MB)\n"
+                        else:
                             info += f"  - {stream.resolution or 'Unknown'} MP4 (Size unknown)\n"
                 else:
                     info += "  - No progressive video streams available\n"
                 
+                info += "\nAvailable Adaptive Video Streams (muxed with audio on download):\n"
+                adaptive_streams = sorted(self.adaptive_video_streams(streams), key=self.resolution_value, reverse=True)
+                if adaptive_streams:
+                    for stream in adaptive_streams:
+                        if stream.filesize:
+                            info += f"  - {stream.resolution or 'Unknown'} {stream.fps or ''}fps MP4 ({stream.filesize // 1024 // 1024} MB)\n"
+                        else:
+                            info += f"  - {stream.resolution or 'Unknown'} MP4 (Size unknown)\n"
+                else:
+                    info += "  - No adaptive video streams available\n"
+                
                 info += "\nAvailable Audio Streams:\n"
-                audio_streams = yt.streams.filter(only_audio=True)
+                audio_streams = self.audio_streams(streams)
                 if audio_streams:
                     for stream in audio_streams:
-                        try:
-                            info += f"  - {stream.abr or 'Unknown'} {stream.mime_type or 'Unknown'}\n"
-                        except:
-                            info += f"  - Audio stream available\n"
+                        info += f"  - {stream.abr or 'Unknown'} {stream.mime_type or 'Unknown'}\n"
                 else:
                     info += "  - No audio streams available\n"
                 
@@ -232,106 +2304,463 @@ class YouTubeConverter:
             
         except Exception as e:
             self.log_message(f"Error fetching video info: {str(e)}")
-            messagebox.showerror("Error", f"Failed to get video info: {str(e)}")
+            self.dispatcher.call(messagebox.showerror, "Error", f"Failed to get video info: {str(e)}")
     
     def sanitize_filename(self, filename):
         return re.sub(r'[<>:"/\\|?*]', '_', filename)
     
-    def progress_callback(self, stream, chunk, bytes_remaining):
-        total_size = stream.filesize
-        bytes_downloaded = total_size - bytes_remaining
-        percentage = (bytes_downloaded / total_size) * 100
-        self.progress_var.set(percentage)
+    def video_id_for(self, url):
+        try:
+            return extract.video_id(url)
+        except Exception:
+            return url
+    
+    def video_cache_key(self, url):
+        return f"video:{self.video_id_for(url)}"
+    
+    def playlist_cache_key(self, url):
+        list_ids = parse_qs(urlparse(url).query).get('list')
+        return f"playlist:{list_ids[0] if list_ids else url}"
+    
+    def get_playlist_metadata(self, url):
+        key = self.playlist_cache_key(url)
+        metadata = self.metadata_cache.get(key)
+        if metadata is None:
+            playlist = Playlist(url)
+            metadata = {
+                'title': playlist.title,
+                'video_urls': list(playlist.video_urls),
+            }
+            self.metadata_cache.put(key, metadata, ttl=self.playlist_ttl)
+        return metadata
+    
+    def get_video_metadata(self, url):
+        key = self.video_cache_key(url)
+        metadata = self.metadata_cache.get(key)
+        if metadata is not None:
+            return metadata
+        
+        yt = YouTube(url)
+        try:
+            rating = yt.rating
+        except Exception:
+            rating = None
+        
+        streams = []
+        for stream in yt.streams:
+            # the size from the stream's contentLength metadata; stream.filesize would send a request
+            # for every stream without one, and download_stream probes the chosen ones anyway
+            filesize = getattr(stream, '_filesize', 0) or 0
+            streams.append({
+                'itag': stream.itag,
+                'url': stream.url,
+                'mime_type': stream.mime_type,
+                'subtype': stream.subtype,
+                'resolution': stream.resolution,
+                'fps': getattr(stream, 'fps', None),
+                'abr': stream.abr,
+                'filesize': filesize,
+                'is_progressive': stream.is_progressive,
+                'is_adaptive': stream.is_adaptive,
+                'includes_video_track': stream.includes_video_track,
+                'includes_audio_track': stream.includes_audio_track,
+            })
+        
+        metadata = {
+            'video_id': yt.video_id,
+            'title': yt.title,
+            'author': yt.author,
+            'length': yt.length,
+            'views': yt.views,
+            'rating': rating,
+            'streams': streams,
+        }
+        
+        ttl = self.metadata_ttl
+        expiries = [int(parse_qs(urlparse(stream['url']).query).get('expire', ['0'])[0]) for stream in streams]
+        expiries = [expire for expire in expiries if expire]
+        if expiries:
+            ttl = max(60, min(ttl, min(expiries) - time.time() - 10 * 60))
+        self.metadata_cache.put(key, metadata, ttl=ttl)
+        return metadata
+    
+    def load_streams(self, metadata):
+        return [SimpleNamespace(**stream) for stream in metadata['streams']]
+    
+    def progressive_streams(self, streams):
+        return [s for s in streams if s.is_progressive and s.subtype == 'mp4']
+    
+    def adaptive_video_streams(self, streams):
+        return [s for s in streams if s.is_adaptive and s.includes_video_track
+                and not s.includes_audio_track and s.subtype == 'mp4']
+    
+    def audio_streams(self, streams):
+        return [s for s in streams if s.includes_audio_track and not s.includes_video_track]
+    
+    def bitrate_value(self, stream):
+        return int(''.join(filter(str.isdigit, stream.abr or '')) or 0)
+    
+    def segment_progress_callback(self, item_id, filesize, bytes_downloaded):
+        self.update_video_progress(item_id, bytes_downloaded / filesize * 100)
+    
+    def get_worker_count(self):
+        try:
+            return max(1, min(16, int(self.workers_var.get())))
+        except ValueError:
+            return 1
+    
+    def get_connection_count(self):
+        try:
+            return max(1, min(16, int(self.connections_var.get())))
+        except ValueError:
+            return 1
+    
+    def combined_progress_callback(self, item_id, received, key, total_size, bytes_downloaded):
+        received[key] = bytes_downloaded
+        self.update_video_progress(item_id, sum(received.values()) / total_size * 100)
+    
+    def resolution_value(self, stream):
+        return int(''.join(filter(str.isdigit, stream.resolution or '')) or 0)
+    
+    def select_adaptive_streams(self, streams, quality):
+        video_streams = self.adaptive_video_streams(streams)
+        if not video_streams:
+            return None, None
+        
+        target = int(''.join(filter(str.isdigit, quality)) or 0)
+        at_or_below = [s for s in video_streams if self.resolution_value(s) <= target]
+        if at_or_below:
+            video_stream = max(at_or_below, key=lambda s: (self.resolution_value(s), s.fps or 0))
+        else:
+            video_stream = min(video_streams, key=lambda s: (self.resolution_value(s), -(s.fps or 0)))
+        
+        audio_streams = self.audio_streams(streams)
+        if not audio_streams:
+            return None, None
+        audio_stream = max(audio_streams, key=lambda s: (s.subtype == 'mp4', self.bitrate_value(s)))
+        return video_stream, audio_stream
+    
+    def mux_streams(self, video_file, audio_file, output_file):
+        command = [get_setting("FFMPEG_BINARY"), '-y', '-loglevel', 'error',
+                   '-i', video_file, '-i', audio_file,
+                   '-map', '0:v:0', '-map', '1:a:0', '-c', 'copy', '-movflags', '+faststart',
+                   output_file]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise Exception(f"Muxing failed: {result.stderr.strip() or 'ffmpeg exited with code ' + str(result.returncode)}")
+    
+    def download_adaptive(self, video_stream, audio_stream, output_dir, safe_title, item_id):
+        output_file = os.path.join(output_dir, f"{safe_title}.mp4")
+        total_size = (video_stream.filesize or 0) + (audio_stream.filesize or 0)
+        received = {}
+        
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            video_future = executor.submit(
+                self.download_stream, video_stream, output_dir, f"{safe_title}.video.mp4", item_id,
+                partial(self.combined_progress_callback, item_id, received, 'video', total_size) if total_size else None)
+            audio_future = executor.submit(
+                self.download_stream, audio_stream, output_dir, f"{safe_title}.audio.{audio_stream.subtype or 'mp4'}", item_id,
+                partial(self.combined_progress_callback, item_id, received, 'audio', total_size) if total_size else None)
+            video_file = video_future.result()
+            audio_file = audio_future.result()
+        
+        self.set_video_status(item_id, "Muxing")
+        self.log_message(f"Muxing video and audio: {safe_title}")
+        self.mux_streams(video_file, audio_file, output_file)
+        os.remove(video_file)
+        os.remove(audio_file)
+        return output_file
+    
+    def probe_filesize(self, url):
+        response = requests.head(url, allow_redirects=True, timeout=30)
+        response.raise_for_status()
+        return int(response.headers.get('Content-Length', 0))
+    
+    def download_stream(self, stream, output_dir, filename, item_id, progress_callback=None):
+        filesize = stream.filesize or self.probe_filesize(stream.url)
+        if not filesize:
+            raise Exception(f"Could not determine the size of {filename}")
+        
+        filepath = os.path.join(output_dir, filename)
+        if os.path.exists(filepath) and os.path.getsize(filepath) == filesize:
+            self.log_message(f"Already downloaded: {filepath}")
+            return filepath
+        if os.path.exists(filepath + '.part'):
+            self.log_message(f"Resuming partial download: {filename}")
+        
+        connections = self.get_connection_count() if filesize >= self.segmented_threshold else 1
+        downloader = SegmentedDownloader(connections=connections)
+        return downloader.download(stream.url, filepath, filesize,
+                                   progress_callback or partial(self.segment_progress_callback, item_id, filesize),
+                                   key=f"{stream.itag}:{filesize}")
+    
+    def get_transcode_pool(self):
+        if self.transcode_pool is None:
+            self.transcode_pool = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1))
+        return self.transcode_pool
+    
+    def record_download(self, video_id, fmt, filepath):
+        if self.manifest is not None and video_id:
+            self.manifest.record(video_id, fmt, filepath)
+    
+    def start_transcode(self, audio_file, mp3_file, item_id, video_id=None, result=None, attempt=1):
+        """Transcode in the process pool, retrying up to ``max_retries`` times. ``transcode_futures``
+        holds one future per item that resolves once the MP3 is written or every attempt failed."""
+        if result is None:
+            result = self.transcode_futures[item_id] = Future()
+        bitrate = self.audio_quality_var.get().replace('kbps', 'k')
+        if attempt == 1:
+            self.set_video_status(item_id, "Transcoding")
+            self.log_message(f"Queued MP3 transcode at {bitrate}bps: {os.path.basename(mp3_file)}")
+        else:
+            self.set_video_status(item_id, f"Transcode retry {attempt - 1}/{self.max_retries}")
+        try:
+            future = self.get_transcode_pool().submit(transcode_to_mp3, audio_file, mp3_file, bitrate)
+        except Exception:
+            # a crashed worker breaks the whole pool, so start a fresh one
+            self.transcode_pool = None
+            future = self.get_transcode_pool().submit(transcode_to_mp3, audio_file, mp3_file, bitrate)
+        future.add_done_callback(partial(self.transcode_done, audio_file, mp3_file, item_id, video_id, result, attempt))
+    
+    def transcode_done(self, audio_file, mp3_file, item_id, video_id, result, attempt, future):
+        try:
+            future.result()
+        except Exception as e:
+            if attempt <= self.max_retries:
+                self.log_message(f"MP3 transcode of {os.path.basename(mp3_file)} failed ({str(e)}), retrying...")
+                try:
+                    self.start_transcode(audio_file, mp3_file, item_id, video_id, result, attempt + 1)
+                    return
+                except Exception as retry_error:
+                    e = retry_error
+            self.set_video_status(item_id, "Transcode failed")
+            self.log_message(f"MP3 transcode failed: {str(e)}. The audio was kept in its original format: {audio_file}")
+            result.set_exception(e)
+            return
+        try:
+            self.record_download(video_id, "mp3", mp3_file)
+        except Exception as e:
+            # download_batch waits on ``result``, so it has to be resolved on every path
+            self.set_video_status(item_id, "Failed")
+            self.log_message(f"Converted {mp3_file} but could not record it in the sync manifest: {str(e)}")
+            result.set_exception(e)
+            return
+        self.set_video_status(item_id, "Done")
+        self.log_message(f"Successfully converted: {mp3_file}")
+        result.set_result(mp3_file)
+    
+    def clear_status_tree(self):
+        self.status_tree.delete(*self.status_tree.get_children())
+    
+    def set_tree_cell(self, item_id, column, value):
+        self.dispatcher.call(self.status_tree.set, item_id, column, value, key=('cell', str(self.status_tree), item_id, column))
+    
+    def set_video_status(self, item_id, status):
+        self.set_tree_cell(item_id, "status", status)
+    
+    def update_video_progress(self, item_id, percentage):
+        self.video_progress[item_id] = percentage
+        self.set_tree_cell(item_id, "progress", f"{percentage:.0f}%")
+        
+        overall = sum(self.video_progress.values()) / len(self.video_progress)
+        self.set_progress(overall)
+        
+        if 0 < overall < 100:
+            elapsed = time.time() - self.batch_start
+            remaining = elapsed * (100 - overall) / overall
+            self.dispatcher.set_var(self.eta_var, f"Overall: {overall:.1f}%  ETA: {time.strftime('%H:%M:%S', time.gmtime(remaining))}")
+        else:
+            self.dispatcher.set_var(self.eta_var, f"Overall: {overall:.1f}%")
     
     def start_download(self):
         if self.download_thread and self.download_thread.is_alive():
             messagebox.showwarning("Warning", "Download already in progress")
             return
+        info_thread = None
+        if self.info_thread and self.info_thread.is_alive():
+            self.info_cancel.set()
+            info_thread = self.info_thread
         
-        self.download_thread = threading.Thread(target=self.download_video_or_playlist)
+        self.download_thread = threading.Thread(target=self.download_video_or_playlist, args=(info_thread,))
         self.download_thread.daemon = True
         self.download_thread.start()
     
-    def download_video_or_playlist(self):
+    def download_video_or_playlist(self, info_thread=None):
+        if info_thread:
+            # let the cancelled lookup finish its tree updates before the download reuses the row ids
+            info_thread.join()
         url = self.url_var.get().strip()
         if not url:
-            messagebox.showerror("Error", "Please enter a YouTube URL")
+            self.dispatcher.call(messagebox.showerror, "Error", "Please enter a YouTube URL")
             return
 
         if "playlist" in url:
             try:
-                playlist = Playlist(url)
-                self.log_message(f"Starting download for playlist: {playlist.title}")
-                total_videos = len(playlist.video_urls)
-                for i, video_url in enumerate(playlist.video_urls):
-                    self.log_message(f"\n--- Downloading video {i+1} of {total_videos} ---")
-                    self.download_single_video(video_url)
-                messagebox.showinfo("Success", "Playlist download completed successfully!")
+                playlist = self.get_playlist_metadata(url)
+                self.log_message(f"Starting download for playlist: {playlist['title']}")
+                video_urls = playlist['video_urls']
+                workers = self.get_worker_count()
+                self.log_message(f"Downloading {len(video_urls)} videos with {workers} workers")
+                failed = self.download_batch(video_urls, workers)
+                if failed:
+                    self.log_message(f"\n{len(failed)} of {len(video_urls)} videos failed:")
+                    for video_url in failed:
+                        self.log_message(f"- {video_url}")
+                    self.dispatcher.call(messagebox.showwarning, "Warning", f"Playlist download finished with {len(failed)} failed videos")
+                else:
+                    self.dispatcher.call(messagebox.showinfo, "Success", "Playlist download completed successfully!")
             except Exception as e:
                 self.log_message(f"Playlist download failed: {str(e)}")
-                messagebox.showerror("Error", f"Playlist download failed: {str(e)}")
+                self.dispatcher.call(messagebox.showerror, "Error", f"Playlist download failed: {str(e)}")
         else:
-            self.download_single_video(url)
+            self.download_batch([url], 1)
+
+    def download_batch(self, video_urls, workers):
+        self.dispatcher.call(self.clear_status_tree)
+        self.playlist_listing = None
+        self.dispatcher.call(self.more_button.config, state="disabled")
+        self.video_progress = {}
+        self.transcode_futures = {}
+        self.batch_start = time.time()
+        self.set_progress(0)
+        self.dispatcher.set_var(self.eta_var, "")
+        self.manifest = DownloadManifest(self.output_dir_var.get()) if self.sync_var.get() else None
+        fmt = self.format_var.get()
+        
+        pending = []
+        for i, video_url in enumerate(video_urls):
+            item_id = str(i)
+            if self.manifest is not None and self.manifest.is_complete(self.video_id_for(video_url), fmt):
+                self.dispatcher.call(self.status_tree.insert, "", tk.END, iid=item_id, values=(i + 1, video_url, "", "100%", "Up to date"))
+                self.video_progress[item_id] = 100.0
+            else:
+                self.dispatcher.call(self.status_tree.insert, "", tk.END, iid=item_id, values=(i + 1, video_url, "", "0%", "Queued"))
+                self.video_progress[item_id] = 0.0
+                pending.append((item_id, video_url))
+        
+        if self.manifest is not None:
+            self.log_message(f"Sync: {len(video_urls) - len(pending)} up to date, {len(pending)} to download")
+        
+        failed = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.download_with_retries, video_url, item_id): video_url
+                       for item_id, video_url in pending}
+            for future in as_completed(futures):
+                if not future.result():
+                    failed.append(futures[future])
+        
+        if self.transcode_futures:
+            self.log_message(f"Waiting for {len(self.transcode_futures)} MP3 transcodes to finish...")
+        for item_id, future in self.transcode_futures.items():
+            if future.exception() is not None:
+                failed.append(video_urls[int(item_id)])
+        return failed
+
+    def download_with_retries(self, url, item_id):
+        attempts = self.max_retries + 1
+        for attempt in range(1, attempts + 1):
+            self.set_video_status(item_id, "Downloading" if attempt == 1 else f"Retry {attempt - 1}/{self.max_retries}")
+            if attempt > 1:
+                self.metadata_cache.delete(self.video_cache_key(url))
+            if self.download_single_video(url, item_id):
+                if item_id not in self.transcode_futures:
+                    self.set_video_status(item_id, "Done")
+                return True
+            if attempt < attempts:
+                time.sleep(2 ** attempt)
+        self.set_video_status(item_id, "Failed")
+        return False
 
-    def download_single_video(self, url):
+    def download_single_video(self, url, item_id):
         try:
-            self.progress_var.set(0)
+            self.update_video_progress(item_id, 0)
             
-            yt = YouTube(url, on_progress_callback=self.progress_callback)
+            metadata = self.get_video_metadata(url)
+            streams = self.load_streams(metadata)
             
-            safe_title = self.sanitize_filename(yt.title or "Unknown_Video")
+            safe_title = self.sanitize_filename(metadata['title'] or "Unknown_Video")
             output_dir = self.output_dir_var.get()
+            self.set_tree_cell(item_id, "title", metadata['title'] or url)
+            self.set_tree_cell(item_id, "length", self.format_length(metadata['length']))
             
             if self.format_var.get() == "mp3":
-                audio_stream = yt.streams.filter(only_audio=True).first()
-                if not audio_stream:
+                audio_streams = self.audio_streams(streams)
+                if not audio_streams:
                     raise Exception("No audio stream available")
+                audio_stream = max(audio_streams, key=self.bitrate_value)
                 
-                self.log_message(f"Downloading audio: {safe_title}")
-                audio_file = audio_stream.download(output_path=output_dir, filename=f"{safe_title}.mp4")
+                self.log_message(f"Downloading audio: {safe_title} ({audio_stream.abr or 'Unknown'})")
+                extension = 'm4a' if audio_stream.subtype == 'mp4' else (audio_stream.subtype or 'm4a')
+                audio_file = self.download_stream(audio_stream, output_dir, f"{safe_title}.{extension}", item_id)
                 
                 mp3_file = os.path.join(output_dir, f"{safe_title}.mp3")
-                self.log_message("Converting to MP3...")
-                
-                try:
-                    os.rename(audio_file, mp3_file)
-                    self.log_message(f"Successfully downloaded: {mp3_file}")
-                except:
-                    self.log_message(f"Downloaded as MP4: {audio_file}")
+                self.start_transcode(audio_file, mp3_file, item_id, metadata['video_id'])
                     
             else:
                 quality = self.quality_var.get()
                 
-                video_stream = yt.streams.filter(progressive=True, file_extension='mp4', resolution=quality).first()
-                
-                if not video_stream:
-                    video_stream = yt.streams.filter(progressive=True, file_extension='mp4').order_by('resolution').desc().first()
+                if self.adaptive_var.get():
+                    video_stream, audio_stream = self.select_adaptive_streams(streams, quality)
                     if video_stream:
-                        actual_quality = video_stream.resolution or "Unknown"
-                        self.log_message(f"Requested quality {quality} not available. Using {actual_quality}")
+                        resolution = video_stream.resolution or "Unknown"
+                        if resolution != quality:
+                            self.log_message(f"Requested quality {quality} not available. Using {resolution}")
+                        self.log_message(f"Downloading video: {safe_title} ({resolution}, adaptive + {audio_stream.abr or 'audio'})")
+                        video_file = self.download_adaptive(video_stream, audio_stream, output_dir, safe_title, item_id)
+                        self.record_download(metadata['video_id'], "mp4", video_file)
+                        self.log_message(f"Successfully downloaded: {video_file}")
+                        self.update_video_progress(item_id, 100)
+                        return True
+                    self.log_message("No adaptive streams available, falling back to progressive")
+                
+                progressive = self.progressive_streams(streams)
+                video_stream = next((s for s in progressive if s.resolution == quality), None)
+                
+                if not video_stream and progressive:
+                    video_stream = max(progressive, key=self.resolution_value)
+                    actual_quality = video_stream.resolution or "Unknown"
+                    self.log_message(f"Requested quality {quality} not available. Using {actual_quality}")
                 
                 if not video_stream:
                     raise Exception("No suitable video stream found")
                 
                 resolution = video_stream.resolution or "Unknown"
                 self.log_message(f"Downloading video: {safe_title} ({resolution})")
-                video_file = video_stream.download(output_path=output_dir, filename=f"{safe_title}.mp4")
+                video_file = self.download_stream(video_stream, output_dir, f"{safe_title}.mp4", item_id)
+                self.record_download(metadata['video_id'], "mp4", video_file)
                 self.log_message(f"Successfully downloaded: {video_file}")
             
-            self.progress_var.set(100)
+            self.update_video_progress(item_id, 100)
+            return True
             
         except Exception as e:
             self.log_message(f"Download failed for {url}: {str(e)}")
-            self.progress_var.set(0)
+            self.update_video_progress(item_id, 0)
+            return False
 
 
 
 class WebScraper:
-    def __init__(self, parent_frame):
+    def __init__(self, parent_frame, dispatcher):
         self.parent_frame = parent_frame
+        self.dispatcher = dispatcher
         self.setup_ui()
         self.scrape_thread = None
         self.scraped_data = []
+        self.item_count = 0
+        self.stream_path = None
+        # items kept in memory for the summary when results are streamed to a file
+        self.preview_limit = 10
+        self.asset_spool = None
+        self.asset_count = 0
+        self.asset_downloader = None
+        self.crawler = None
+        self.http_cache = HttpCache(APP_DATA_DIR / "http")
+        self.diff_state = ScrapeDiffState(APP_DATA_DIR / "diff")
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        })
         
     def setup_ui(self):
         main_frame = ttk.Frame(self.parent_frame, padding="10")
@@ -342,43 +2771,95 @@ class WebScraper:
         url_entry = ttk.Entry(main_frame, textvariable=self.url_var, width=60)
         url_entry.grid(row=0, column=1, columnspan=2, sticky=(tk.W, tk.E), pady=5)
         
-        ttk.Label(main_frame, text="Scrape Type:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        ttk.Label(main_frame, text="URL List File:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        self.url_list_var = tk.StringVar()
+        ttk.Entry(main_frame, textvariable=self.url_list_var, width=40).grid(row=1, column=1, sticky=(tk.W, tk.E), pady=5)
+        ttk.Button(main_frame, text="Browse", command=self.browse_url_list).grid(row=1, column=2, pady=5)
+        
+        ttk.Label(main_frame, text="Scrape Type:").grid(row=2, column=0, sticky=tk.W, pady=5)
         self.scrape_type_var = tk.StringVar(value="custom")
         scrape_combo = ttk.Combobox(main_frame, textvariable=self.scrape_type_var, 
                                    values=["custom", "links", "images", "text", "tables"], 
                                    state="readonly", width=15)
-        scrape_combo.grid(row=1, column=1, sticky=tk.W, pady=5)
+        scrape_combo.grid(row=2, column=1, sticky=tk.W, pady=5)
+        
+        parser_frame = ttk.Frame(main_frame)
+        parser_frame.grid(row=2, column=2, sticky=tk.W, pady=5)
+        ttk.Label(parser_frame, text="Parser:").pack(side=tk.LEFT, padx=(0, 5))
+        self.parser_var = tk.StringVar(value="auto")
+        ttk.Combobox(parser_frame, textvariable=self.parser_var, values=HTML_PARSERS,
+                     state="readonly", width=10).pack(side=tk.LEFT)
+        self.targeted_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(parser_frame, text="Targeted parsing", variable=self.targeted_var).pack(side=tk.LEFT, padx=(10, 0))
+        self.use_cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(parser_frame, text="Cache pages", variable=self.use_cache_var).pack(side=tk.LEFT, padx=(10, 0))
+        self.diff_mode_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(parser_frame, text="Only changes", variable=self.diff_mode_var).pack(side=tk.LEFT, padx=(10, 0))
+        self.stream_parse_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(parser_frame, text="Stream parse", variable=self.stream_parse_var).pack(side=tk.LEFT, padx=(10, 0))
         
-        ttk.Label(main_frame, text="CSS Selector:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        ttk.Label(main_frame, text="CSS Selector:").grid(row=3, column=0, sticky=tk.W, pady=5)
         self.selector_var = tk.StringVar()
         selector_entry = ttk.Entry(main_frame, textvariable=self.selector_var, width=60)
-        selector_entry.grid(row=2, column=1, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+        selector_entry.grid(row=3, column=1, columnspan=2, sticky=(tk.W, tk.E), pady=5)
         
-        ttk.Label(main_frame, text="Delay (seconds):").grid(row=3, column=0, sticky=tk.W, pady=5)
+        ttk.Label(main_frame, text="Delay per host (s):").grid(row=4, column=0, sticky=tk.W, pady=5)
+        crawl_frame = ttk.Frame(main_frame)
+        crawl_frame.grid(row=4, column=1, columnspan=2, sticky=tk.W, pady=5)
         self.delay_var = tk.StringVar(value="1")
-        delay_entry = ttk.Entry(main_frame, textvariable=self.delay_var, width=10)
-        delay_entry.grid(row=3, column=1, sticky=tk.W, pady=5)
+        ttk.Entry(crawl_frame, textvariable=self.delay_var, width=6).pack(side=tk.LEFT)
+        ttk.Label(crawl_frame, text="Max Depth:").pack(side=tk.LEFT, padx=(15, 5))
+        self.max_depth_var = tk.StringVar(value="0")
+        ttk.Spinbox(crawl_frame, from_=0, to=10, textvariable=self.max_depth_var, width=5).pack(side=tk.LEFT)
+        ttk.Label(crawl_frame, text="Max Pages:").pack(side=tk.LEFT, padx=(15, 5))
+        self.max_pages_var = tk.StringVar(value="1")
+        ttk.Spinbox(crawl_frame, from_=1, to=100000, textvariable=self.max_pages_var, width=8).pack(side=tk.LEFT)
+        ttk.Label(crawl_frame, text="Concurrency:").pack(side=tk.LEFT, padx=(15, 5))
+        self.concurrency_var = tk.StringVar(value="4")
+        ttk.Spinbox(crawl_frame, from_=1, to=32, textvariable=self.concurrency_var, width=5).pack(side=tk.LEFT)
         
-        ttk.Label(main_frame, text="Output Directory:").grid(row=4, column=0, sticky=tk.W, pady=5)
+        ttk.Label(main_frame, text="Follow:").grid(row=5, column=0, sticky=tk.W, pady=5)
+        follow_frame = ttk.Frame(main_frame)
+        follow_frame.grid(row=5, column=1, columnspan=2, sticky=(tk.W, tk.E), pady=5)
+        self.follow_mode_var = tk.StringVar(value="all links")
+        ttk.Combobox(follow_frame, textvariable=self.follow_mode_var, values=FOLLOW_MODES,
+                     state="readonly", width=10).pack(side=tk.LEFT)
+        ttk.Label(follow_frame, text="Follow Selector:").pack(side=tk.LEFT, padx=(15, 5))
+        self.follow_selector_var = tk.StringVar()
+        ttk.Entry(follow_frame, textvariable=self.follow_selector_var, width=30).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        ttk.Label(main_frame, text="Output Directory:").grid(row=6, column=0, sticky=tk.W, pady=5)
         self.output_dir_var = tk.StringVar(value=str(Path.home() / "Downloads"))
-        ttk.Entry(main_frame, textvariable=self.output_dir_var, width=40).grid(row=4, column=1, sticky=(tk.W, tk.E), pady=5)
-        ttk.Button(main_frame, text="Browse", command=self.browse_directory).grid(row=4, column=2, pady=5)
+        ttk.Entry(main_frame, textvariable=self.output_dir_var, width=40).grid(row=6, column=1, sticky=(tk.W, tk.E), pady=5)
+        ttk.Button(main_frame, text="Browse", command=self.browse_directory).grid(row=6, column=2, pady=5)
+        
+        ttk.Label(main_frame, text="Stream Output:").grid(row=7, column=0, sticky=tk.W, pady=5)
+        self.stream_var = tk.StringVar(value="off")
+        ttk.Combobox(main_frame, textvariable=self.stream_var, values=["off"] + list(STREAM_SINKS),
+                     state="readonly", width=10).grid(row=7, column=1, sticky=tk.W, pady=5)
+        asset_frame = ttk.Frame(main_frame)
+        asset_frame.grid(row=7, column=2, sticky=tk.W, pady=5)
+        ttk.Label(asset_frame, text="Image Width:").pack(side=tk.LEFT, padx=(0, 5))
+        self.image_width_var = tk.StringVar(value="0")
+        ttk.Spinbox(asset_frame, from_=0, to=8000, increment=100, textvariable=self.image_width_var, width=6).pack(side=tk.LEFT)
         
         button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=5, column=0, columnspan=3, pady=10)
+        button_frame.grid(row=8, column=0, columnspan=3, pady=10)
         
-        ttk.Button(button_frame, text="Preview", command=self.preview_scrape).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Preview", command=self.start_preview).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Start Scraping", command=self.start_scraping).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Stop", command=self.stop_scraping).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Save CSV", command=self.save_csv).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Save JSON", command=self.save_json).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Download Assets", command=self.start_asset_download).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Clear", command=self.clear_fields).pack(side=tk.LEFT, padx=5)
         
         self.progress_var = tk.DoubleVar()
         self.progress_bar = ttk.Progressbar(main_frame, variable=self.progress_var, maximum=100)
-        self.progress_bar.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
+        self.progress_bar.grid(row=9, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10)
         
         self.results_text = scrolledtext.ScrolledText(main_frame, height=15, width=80)
-        self.results_text.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
+        self.results_text.grid(row=10, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
         
         main_frame.columnconfigure(1, weight=1)
         self.parent_frame.rowconfigure(0, weight=1)
@@ -388,14 +2869,8 @@ class WebScraper:
         
     def on_scrape_type_change(self, event=None):
         scrape_type = self.scrape_type_var.get()
-        if scrape_type == "links":
-            self.selector_var.set("a")
-        elif scrape_type == "images":
-            self.selector_var.set("img")
-        elif scrape_type == "text":
-            self.selector_var.set("p, h1, h2, h3, h4, h5, h6")
-        elif scrape_type == "tables":
-            self.selector_var.set("table")
+        if scrape_type in SCRAPE_PRESETS:
+            self.selector_var.set(SCRAPE_PRESETS[scrape_type][0])
         else:
             self.selector_var.set("")
     
@@ -404,42 +2879,175 @@ class WebScraper:
         if directory:
             self.output_dir_var.set(directory)
     
+    def browse_url_list(self):
+        filename = filedialog.askopenfilename(filetypes=[("URL lists", "*.txt *.csv"), ("All files", "*.*")])
+        if filename:
+            self.url_list_var.set(filename)
+    
+    def load_url_list(self, path):
+        """One URL per line, or the first column of a .csv file; blank lines and # comments are skipped."""
+        urls = []
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            if path.lower().endswith('.csv'):
+                lines = (row[0] if row else '' for row in csv.reader(f))
+            else:
+                lines = f
+            for line in lines:
+                line = line.strip()
+                if line and not line.startswith('#') and urlparse(line).scheme in ('http', 'https'):
+                    urls.append(line)
+        return list(dict.fromkeys(urls))
+    
     def log_message(self, message):
-        self.results_text.insert(tk.END, message + "\n")
-        self.results_text.see(tk.END)
-        self.results_text.update()
+        self.dispatcher.log(self.results_text, message)
+    
+    def set_progress(self, value):
+        self.dispatcher.set_var(self.progress_var, value)
     
     def clear_fields(self):
         self.url_var.set("")
+        self.url_list_var.set("")
         self.selector_var.set("")
         self.results_text.delete(1.0, tk.END)
         self.progress_var.set(0)
         self.scraped_data = []
+        self.item_count = 0
+        self.stream_path = None
+        self.reset_asset_spool()
+    
+    def reset_asset_spool(self):
+        if self.asset_spool:
+            self.asset_spool.close()
+            try:
+                os.remove(self.asset_spool.name)
+            except OSError:
+                pass
+        self.asset_spool = None
+        self.asset_count = 0
+    
+    def spool_assets(self, items):
+        """Append image sources to a temporary file, so a long crawl doesn't keep them all in memory
+        until Download Assets is pressed."""
+        if self.asset_spool is None:
+            self.asset_spool = tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.assets', delete=False)
+        for item in items:
+            if item.get('change') != 'removed':
+                self.asset_spool.write(json.dumps([item['src'], item['srcset']]) + "\n")
+                self.asset_count += 1
+    
+    def spooled_assets(self):
+        self.asset_spool.flush()
+        with open(self.asset_spool.name, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
     
     def get_page_content(self, url):
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers)
+        if self.use_cache_var.get():
+            content, status = self.http_cache.fetch(self.session, url)
+            if status != 'fetched':
+                self.log_message(f"Using cached page ({status})")
+            return content
+        response = self.session.get(url, timeout=30)
         response.raise_for_status()
         return response.text
     
+    def parse_page(self, content, scrape_type, selector, follow_tags=()):
+        """Parse ``content``; ``follow_tags`` are extra tags link-following needs, or None when
+        following by a custom selector requires the whole document."""
+        only_tags = None
+        if (self.targeted_var.get() and follow_tags is not None and scrape_type in SCRAPE_PRESETS
+                and selector == SCRAPE_PRESETS[scrape_type][0]):
+            only_tags = SCRAPE_PRESETS[scrape_type][1]
+            only_tags = only_tags + [tag for tag in follow_tags if tag not in only_tags]
+        return make_soup(content, self.parser_var.get(), only_tags)
+    
+    def follow_links(self, soup, page_url, follow_mode, follow_selector):
+        if follow_mode == "next page":
+            elements = soup.select('a[rel~=next], link[rel~=next]')
+        elif follow_mode == "selector":
+            elements = soup.select(follow_selector)
+        else:
+            elements = soup.find_all('a', href=True)
+        return [urljoin(page_url, element['href']) for element in elements if element.get('href')]
+    
+    def get_int(self, variable, default, minimum=0):
+        try:
+            return max(minimum, int(variable.get()))
+        except ValueError:
+            return default
+    
+    def extract_items(self, soup, url, scrape_type, selector):
+        items = []
+        for i, element in enumerate(soup.select(selector)):
+            item = self.extract_element(element, i + 1, url, scrape_type)
+            if item:
+                items.append(item)
+        return items
+    
+    def extract_element(self, element, index, url, scrape_type):
+        if scrape_type == "links":
+            href = element.get('href', '')
+            if href:
+                return {
+                    'text': element.get_text().strip(),
+                    'url': urljoin(url, href),
+                    'title': element.get('title', ''),
+                    'index': index
+                }
+        
+        elif scrape_type == "images":
+            src = element.get('src', '')
+            srcset = element.get('srcset', '')
+            if src or srcset:
+                if srcset:
+                    srcset = ', '.join(
+                        ' '.join([urljoin(url, parts[0])] + parts[1:])
+                        for parts in (candidate.split() for candidate in srcset.split(',')) if parts)
+                return {
+                    'alt': element.get('alt', ''),
+                    'src': urljoin(url, src) if src else '',
+                    'srcset': srcset,
+                    'title': element.get('title', ''),
+                    'index': index
+                }
+        
+        elif scrape_type == "tables":
+            columns = extract_table(element)
+            if columns:
+                return {
+                    'table_index': index,
+                    'header': list(columns),
+                    'row_count': len(next(iter(columns.values()))),
+                    'columns': columns
+                }
+        
+        else:
+            text = element.get_text().strip()
+            if text:
+                return {
+                    'text': text,
+                    'tag': element.name,
+                    'class': ' '.join(element.get('class', [])),
+                    'id': element.get('id', ''),
+                    'index': index
+                }
+        return None
+    
     def preview_scrape(self):
         url = self.url_var.get().strip()
         if not url:
-            messagebox.showerror("Error", "Please enter a website URL")
+            self.dispatcher.call(messagebox.showerror, "Error", "Please enter a website URL")
             return
         
         try:
             self.log_message("Fetching page content...")
             content = self.get_page_content(url)
-            soup = BeautifulSoup(content, 'html.parser')
-            
             scrape_type = self.scrape_type_var.get()
             selector = self.selector_var.get().strip()
+            soup = self.parse_page(content, scrape_type, selector)
             
             if not selector and scrape_type == "custom":
-                messagebox.showerror("Error", "Please enter a CSS selector for custom scraping")
+                self.dispatcher.call(messagebox.showerror, "Error", "Please enter a CSS selector for custom scraping")
                 return
             
             elements = soup.select(selector)
@@ -467,7 +3075,16 @@ class WebScraper:
             
         except Exception as e:
             self.log_message(f"Preview failed: {str(e)}")
-            messagebox.showerror("Error", f"Preview failed: {str(e)}")
+            self.dispatcher.call(messagebox.showerror, "Error", f"Preview failed: {str(e)}")
+    
+    def start_preview(self):
+        if self.scrape_thread and self.scrape_thread.is_alive():
+            messagebox.showwarning("Warning", "Scraping already in progress")
+            return
+        
+        self.scrape_thread = threading.Thread(target=self.preview_scrape)
+        self.scrape_thread.daemon = True
+        self.scrape_thread.start()
     
     def start_scraping(self):
         if self.scrape_thread and self.scrape_thread.is_alive():
@@ -478,115 +3095,311 @@ class WebScraper:
         self.scrape_thread.daemon = True
         self.scrape_thread.start()
     
+    def stop_scraping(self):
+        if not (self.scrape_thread and self.scrape_thread.is_alive()):
+            return
+        if self.asset_downloader:
+            self.asset_downloader.stop()
+            self.log_message("Stopping asset downloads...")
+        elif self.crawler:
+            self.crawler.stop()
+            self.log_message("Stopping after the pages already in flight...")
+    
+    def start_asset_download(self):
+        if self.scrape_thread and self.scrape_thread.is_alive():
+            messagebox.showwarning("Warning", "Scraping already in progress")
+            return
+        if not self.asset_count:
+            messagebox.showwarning("Warning", "No assets to download. Please scrape images first.")
+            return
+        
+        self.scrape_thread = threading.Thread(target=self.download_assets)
+        self.scrape_thread.daemon = True
+        self.scrape_thread.start()
+    
+    def download_assets(self):
+        width = self.get_int(self.image_width_var, 0)
+        urls = (pick_srcset(srcset, width) if srcset else src for src, srcset in self.spooled_assets())
+        
+        output_dir = os.path.join(self.output_dir_var.get(), "assets")
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            concurrency = self.get_int(self.concurrency_var, 4, minimum=1)
+            self.asset_downloader = AssetDownloader(self.session, output_dir, workers=concurrency)
+            self.log_message(f"Downloading {self.asset_count} assets to {output_dir}...")
+            self.set_progress(0)
+            
+            def on_error(url, error):
+                self.log_message(f"Failed to download {url}: {str(error)}")
+            
+            stats = self.asset_downloader.run((url for url in urls if url),
+                                              lambda done, total: self.set_progress(done / total * 100), on_error,
+                                              total=self.asset_count)
+            self.log_message(
+                f"Assets: {stats['downloaded']} downloaded, {stats['duplicate']} duplicates, "
+                f"{stats['skipped']} already present, {stats['failed']} failed")
+            self.log_message(
+                f"Fetched {stats['bytes'] / (1024 * 1024):.1f} MB in {stats['seconds']:.1f}s "
+                f"({stats['throughput'] / (1024 * 1024):.2f} MB/s)")
+            self.set_progress(100)
+            self.dispatcher.call(messagebox.showinfo, "Success", f"Downloaded {stats['downloaded']} assets to {output_dir}")
+        except Exception as e:
+            self.log_message(f"Asset download failed: {str(e)}")
+            self.dispatcher.call(messagebox.showerror, "Error", f"Asset download failed: {str(e)}")
+        finally:
+            self.asset_downloader = None
+    
     def scrape_website(self):
         url = self.url_var.get().strip()
-        if not url:
-            messagebox.showerror("Error", "Please enter a website URL")
+        url_list_path = self.url_list_var.get().strip()
+        batch = bool(url_list_path)
+        if batch:
+            try:
+                start_urls = self.load_url_list(url_list_path)
+            except OSError as e:
+                self.dispatcher.call(messagebox.showerror, "Error", f"Could not read URL list: {str(e)}")
+                return
+            if not start_urls:
+                self.dispatcher.call(messagebox.showerror, "Error", "The URL list file contains no http(s) URLs")
+                return
+        elif url:
+            start_urls = [url]
+        else:
+            self.dispatcher.call(messagebox.showerror, "Error", "Please enter a website URL")
+            return
+        
+        scrape_type = self.scrape_type_var.get()
+        selector = self.selector_var.get().strip()
+        if not selector and scrape_type == "custom":
+            self.dispatcher.call(messagebox.showerror, "Error", "Please enter a CSS selector for custom scraping")
             return
         
+        sink = None
+        status_file = None
         try:
             self.log_message("Starting web scraping...")
-            self.progress_var.set(0)
+            self.set_progress(0)
             self.scraped_data = []
+            self.item_count = 0
+            self.stream_path = None
+            self.reset_asset_spool()
+            
+            stream_format = self.stream_var.get()
+            if stream_format in STREAM_SINKS:
+                filename = f"scraped_data_{int(time.time())}.{stream_format}"
+                sink = STREAM_SINKS[stream_format](os.path.join(self.output_dir_var.get(), filename))
+                self.stream_path = sink.path
+                self.log_message(f"Streaming results to {sink.path}")
             
             delay = float(self.delay_var.get())
+            max_depth = self.get_int(self.max_depth_var, 0)
+            max_pages = self.get_int(self.max_pages_var, 1, minimum=1)
+            concurrency = self.get_int(self.concurrency_var, 4, minimum=1)
             
-            content = self.get_page_content(url)
-            soup = BeautifulSoup(content, 'html.parser')
+            status_writer = None
+            if batch:
+                # every listed URL is scraped exactly once; links are not followed
+                max_depth = 0
+                max_pages = len(start_urls)
+                status_path = os.path.join(self.output_dir_var.get(), f"scrape_status_{int(time.time())}.csv")
+                status_file = open(status_path, 'w', newline='', encoding='utf-8')
+                status_writer = csv.writer(status_file)
+                status_writer.writerow(['url', 'status', 'http_status', 'items', 'seconds'])
+                self.log_message(f"Scraping {len(start_urls)} URLs from {url_list_path}")
             
-            scrape_type = self.scrape_type_var.get()
-            selector = self.selector_var.get().strip()
+            follow_mode = self.follow_mode_var.get()
+            follow_selector = self.follow_selector_var.get().strip()
+            follow_tags = ["a"]
+            if follow_mode == "selector":
+                if not follow_selector:
+                    self.dispatcher.call(messagebox.showerror, "Error", "Please enter a follow selector")
+                    return
+                follow_tags = None
+            elif follow_mode == "next page":
+                # every next link is one level deeper, so paginate until the page limit instead
+                max_depth = max(max_depth, max_pages)
+                follow_tags = ["a", "link"]
             
-            if not selector and scrape_type == "custom":
-                messagebox.showerror("Error", "Please enter a CSS selector for custom scraping")
-                return
+            self.crawler = Crawler(session=self.session, concurrency=concurrency, delay=delay,
+                                   max_depth=max_depth, max_pages=max_pages, same_host=not batch,
+                                   http_cache=self.http_cache if self.use_cache_var.get() else None,
+                                   record_times=batch)
             
-            elements = soup.select(selector)
-            total_elements = len(elements)
+            diff_mode = self.diff_mode_var.get()
+            diff_counts = {'added': 0, 'removed': 0, 'changed': 0, 'unchanged pages': 0}
             
-            self.log_message(f"Found {total_elements} elements to scrape")
+            stream_parse = self.stream_parse_var.get()
+            if stream_parse and (batch or max_pages > 1 or diff_mode):
+                self.log_message("Stream parse works on a single page without diff mode; using the normal parser")
+                stream_parse = False
+            if stream_parse:
+                try:
+                    parse_simple_selector(selector)
+                except ValueError as e:
+                    self.log_message(f"{str(e)}; using the normal parser")
+                    stream_parse = False
             
-            for i, element in enumerate(elements):
-                if scrape_type == "links":
-                    href = element.get('href', '')
-                    if href:
-                        full_url = urljoin(url, href)
-                        data = {
-                            'text': element.get_text().strip(),
-                            'url': full_url,
-                            'title': element.get('title', ''),
-                            'index': i + 1
-                        }
-                        self.scraped_data.append(data)
-                
-                elif scrape_type == "images":
-                    src = element.get('src', '')
-                    if src:
-                        full_url = urljoin(url, src)
-                        data = {
-                            'alt': element.get('alt', ''),
-                            'src': full_url,
-                            'title': element.get('title', ''),
-                            'index': i + 1
-                        }
-                        self.scraped_data.append(data)
-                
-                elif scrape_type == "tables":
-                    rows = element.find_all('tr')
-                    for row_idx, row in enumerate(rows):
-                        cells = row.find_all(['td', 'th'])
-                        if cells:
-                            data = {
-                                'table_index': i + 1,
-                                'row_index': row_idx + 1,
-                                'cells': [cell.get_text().strip() for cell in cells]
-                            }
-                            self.scraped_data.append(data)
-                
+            def store_items(page_url, items):
+                self.item_count += len(items)
+                if scrape_type == "images":
+                    self.spool_assets(items)
+                if sink and scrape_type == "tables" and hasattr(sink, 'write_table') and not diff_mode:
+                    for item in items:
+                        sink.write_table(page_url, item['table_index'], item['columns'])
+                elif sink and scrape_type == "tables":
+                    for item in items:
+                        for row in table_item_rows(item):
+                            sink.write(row)
+                elif sink:
+                    for item in items:
+                        sink.write(item)
+                if sink:
+                    room = self.preview_limit - len(self.scraped_data)
+                    if room > 0:
+                        self.scraped_data.extend(items[:room])
                 else:
-                    text = element.get_text().strip()
-                    if text:
-                        data = {
-                            'text': text,
-                            'tag': element.name,
-                            'class': ' '.join(element.get('class', [])),
-                            'id': element.get('id', ''),
-                            'index': i + 1
-                        }
-                        self.scraped_data.append(data)
+                    self.scraped_data.extend(items)
+            
+            def on_page(page_url, depth, content, status):
+                previous = None
+                if diff_mode:
+                    previous = self.diff_state.load(page_url, scrape_type, selector)
+                    body_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+                    # a 304 hands back the cached body, so the hash check covers revalidated pages too
+                    if previous and previous['body_hash'] == body_hash:
+                        diff_counts['unchanged pages'] += 1
+                        if status_writer:
+                            status_writer.writerow([page_url, 'unchanged', 304 if status == 'revalidated' else 200, 0,
+                                                    f"{self.crawler.fetch_times.pop(page_url, 0):.3f}"])
+                        elif max_pages > 1:
+                            self.log_message(f"Unchanged ({status}): {page_url}")
+                        self.set_progress(min(self.crawler.pages_done / max_pages * 100, 100))
+                        if depth >= max_depth:
+                            return []
+                        soup = make_soup(content, self.parser_var.get(),
+                                         follow_tags if self.targeted_var.get() else None)
+                        return self.follow_links(soup, page_url, follow_mode, follow_selector)
+                
+                soup = self.parse_page(content, scrape_type, selector,
+                                       follow_tags=follow_tags if depth < max_depth else ())
+                items = self.extract_items(soup, page_url, scrape_type, selector)
+                links = self.follow_links(soup, page_url, follow_mode, follow_selector) if depth < max_depth else []
+                if batch:
+                    for item in items:
+                        item['source_url'] = page_url
+                elif max_pages > 1:
+                    for item in items:
+                        item['page_url'] = page_url
+                if diff_mode:
+                    items, current = self.diff_state.diff(previous, items, scrape_type)
+                    self.diff_state.save(page_url, scrape_type, selector,
+                                         {'body_hash': body_hash, 'items': current})
+                    for item in items:
+                        diff_counts[item['change']] += 1
+                store_items(page_url, items)
                 
-                progress = (i + 1) / total_elements * 100
-                self.progress_var.set(progress)
+                if status_writer:
+                    status_writer.writerow([page_url, 'ok', 304 if status == 'revalidated' else 200, len(items),
+                                            f"{self.crawler.fetch_times.pop(page_url, 0):.3f}"])
+                elif max_pages > 1:
+                    self.log_message(f"Scraped {page_url} (depth {depth}): {len(items)} items")
+                self.set_progress(min(self.crawler.pages_done / max_pages * 100, 100))
                 
-                if delay > 0:
-                    time.sleep(delay)
+                return links
+            
+            def on_error(page_url, error):
+                if max_pages == 1 and not batch:
+                    raise error
+                if status_writer:
+                    response = getattr(error, 'response', None)
+                    if isinstance(error, requests.Timeout):
+                        status = 'timeout'
+                    elif response is not None:
+                        status = 'http error'
+                    else:
+                        status = 'error'
+                    status_writer.writerow([page_url, status, response.status_code if response is not None else '',
+                                            0, f"{self.crawler.fetch_times.pop(page_url, 0):.3f}"])
+                self.log_message(f"Failed to scrape {page_url}: {str(error)}")
+            
+            def on_element(element):
+                if scrape_type == "tables":
+                    element = make_soup(element.markup, self.parser_var.get(), ["table"]).table
+                element_count[0] += 1
+                item = self.extract_element(element, element_count[0], url, scrape_type)
+                if item:
+                    store_items(url, [item])
+                    if self.item_count % 1000 == 0:
+                        self.log_message(f"{self.item_count} items so far...")
             
-            self.log_message(f"Scraping completed! Extracted {len(self.scraped_data)} items")
+            crawl_start = time.time()
+            if stream_parse:
+                element_count = [0]
+                self.log_message("Streaming page through the incremental parser...")
+                received = stream_elements(self.session, url, selector, on_element,
+                                           keep_markup=scrape_type == "tables", stop_event=self.crawler.stop_event)
+                self.log_message(f"Parsed {received / (1024 * 1024):.1f} MB in {time.time() - crawl_start:.1f}s")
+                pages = 1
+            else:
+                pages = self.crawler.crawl(start_urls, on_page, on_error)
+            elapsed = time.time() - crawl_start
+            if max_pages > 1:
+                self.log_message(f"Crawled {pages} pages in {elapsed:.1f}s ({pages / elapsed if elapsed else 0:.1f} pages/s)")
+            if status_file:
+                status_file.close()
+                self.log_message(f"Per-URL status written to {status_path}")
+            if sink:
+                sink.close()
+                self.log_message(f"Wrote {self.item_count} items to {sink.path}")
+            
+            if diff_mode:
+                self.log_message("Changes: " + ", ".join(f"{count} {name}" for name, count in diff_counts.items()))
+            self.log_message(f"Scraping completed! Extracted {self.item_count} items")
             
-            for item in self.scraped_data[:10]:
+            for item in self.scraped_data[:self.preview_limit]:
                 if scrape_type == "links":
                     self.log_message(f"Link: {item['text'][:50]} -> {item['url']}")
                 elif scrape_type == "images":
-                    self.log_message(f"Image: {item['alt'][:30]} -> {item['src']}")
+                    self.log_message(f"Image: {item['alt'][:30]} -> {item['src'] or item['srcset']}")
                 elif scrape_type == "tables":
-                    self.log_message(f"Table {item['table_index']}, Row {item['row_index']}: {', '.join(item['cells'][:3])}")
+                    self.log_message(f"Table {item['table_index']}: {item['row_count']} rows, columns {', '.join(item['header'][:5])}")
                 else:
                     self.log_message(f"Text: {item['text'][:100]}...")
             
-            if len(self.scraped_data) > 10:
-                self.log_message(f"... and {len(self.scraped_data) - 10} more items")
+            if self.item_count > 10:
+                self.log_message(f"... and {self.item_count - 10} more items")
             
-            self.progress_var.set(100)
-            messagebox.showinfo("Success", f"Scraping completed! Found {len(self.scraped_data)} items")
+            self.set_progress(100)
+            self.dispatcher.call(messagebox.showinfo, "Success", f"Scraping completed! Found {self.item_count} items")
             
         except Exception as e:
             self.log_message(f"Scraping failed: {str(e)}")
-            messagebox.showerror("Error", f"Scraping failed: {str(e)}")
-            self.progress_var.set(0)
+            self.dispatcher.call(messagebox.showerror, "Error", f"Scraping failed: {str(e)}")
+            self.set_progress(0)
+        finally:
+            if sink:
+                sink.close()
+            if status_file:
+                status_file.close()
     
-    def save_csv(self):
+    def check_saved_data(self):
         if not self.scraped_data:
             messagebox.showwarning("Warning", "No data to save. Please scrape a website first.")
+            return False
+        if self.stream_path:
+            messagebox.showinfo("Info", f"Results were streamed to {self.stream_path}")
+            return False
+        return True
+    
+    def saved_rows(self):
+        for item in self.scraped_data:
+            if 'columns' in item:
+                yield from table_item_rows(item)
+            else:
+                yield item
+    
+    def save_csv(self):
+        if not self.check_saved_data():
             return
         
         try:
@@ -594,12 +3407,12 @@ class WebScraper:
             filename = f"scraped_data_{int(time.time())}.csv"
             filepath = os.path.join(output_dir, filename)
             
+            fieldnames = list(dict.fromkeys(key for item in self.saved_rows() for key in item))
             with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-                if self.scraped_data:
-                    fieldnames = self.scraped_data[0].keys()
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(self.scraped_data)
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+                writer.writeheader()
+                for item in self.saved_rows():
+                    writer.writerow({key: csv_value(value) for key, value in item.items()})
             
             self.log_message(f"Data saved to CSV: {filepath}")
             messagebox.showinfo("Success", f"Data saved to {filename}")
@@ -609,8 +3422,7 @@ class WebScraper:
             messagebox.showerror("Error", f"Failed to save CSV: {str(e)}")
     
     def save_json(self):
-        if not self.scraped_data:
-            messagebox.showwarning("Warning", "No data to save. Please scrape a website first.")
+        if not self.check_saved_data():
             return
         
         try:
@@ -619,7 +3431,12 @@ class WebScraper:
             filepath = os.path.join(output_dir, filename)
             
             with open(filepath, 'w', encoding='utf-8') as jsonfile:
-                json.dump(self.scraped_data, jsonfile, indent=2, ensure_ascii=False)
+                jsonfile.write('[\n')
+                for i, item in enumerate(self.saved_rows()):
+                    if i:
+                        jsonfile.write(',\n')
+                    jsonfile.write(json.dumps(item, indent=2, ensure_ascii=False))
+                jsonfile.write('\n]\n')
             
             self.log_message(f"Data saved to JSON: {filepath}")
             messagebox.showinfo("Success", f"Data saved to {filename}")
@@ -630,10 +3447,12 @@ class WebScraper:
 
 
 class PdfMergerModule:
-    def __init__(self, parent_frame):
+    def __init__(self, parent_frame, dispatcher):
         self.parent_frame = parent_frame
+        self.dispatcher = dispatcher
         self.setup_ui()
         self.merge_thread = None
+        self.process_pool = None
 
     def setup_ui(self):
         main_frame = ttk.Frame(self.parent_frame, padding="10")
@@ -648,18 +3467,34 @@ class PdfMergerModule:
         self.output_name_var = tk.StringVar(value="merged.pdf")
         ttk.Entry(main_frame, textvariable=self.output_name_var, width=60).grid(row=1, column=1, sticky=(tk.W, tk.E), pady=5)
 
+        ttk.Label(main_frame, text="Bad Files:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        self.bad_files_var = tk.StringVar(value="skip")
+        ttk.Combobox(main_frame, textvariable=self.bad_files_var, values=["skip", "quarantine"],
+                     state="readonly", width=12).grid(row=2, column=1, sticky=tk.W, pady=5)
+        self.dedup_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(main_frame, text="Deduplicate resources", variable=self.dedup_var).grid(row=2, column=2, sticky=tk.W, pady=5)
+        
+        ttk.Label(main_frame, text="Batch Mode:").grid(row=3, column=0, sticky=tk.W, pady=5)
+        self.batch_var = tk.StringVar(value="off")
+        ttk.Combobox(main_frame, textvariable=self.batch_var, values=["off", "per subfolder", "per pattern"],
+                     state="readonly", width=15).grid(row=3, column=1, sticky=tk.W, pady=5)
+        
+        ttk.Label(main_frame, text="Group Patterns:").grid(row=4, column=0, sticky=tk.W, pady=5)
+        self.patterns_var = tk.StringVar(value="invoice_*.pdf, report_*.pdf")
+        ttk.Entry(main_frame, textvariable=self.patterns_var, width=60).grid(row=4, column=1, sticky=(tk.W, tk.E), pady=5)
+
         button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=2, column=0, columnspan=3, pady=10)
+        button_frame.grid(row=5, column=0, columnspan=3, pady=10)
 
         ttk.Button(button_frame, text="Merge PDFs", command=self.start_merge).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Clear", command=self.clear_fields).pack(side=tk.LEFT, padx=5)
 
         self.progress_var = tk.DoubleVar()
         self.progress_bar = ttk.Progressbar(main_frame, variable=self.progress_var, maximum=100)
-        self.progress_bar.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
+        self.progress_bar.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=10)
 
         self.info_text = scrolledtext.ScrolledText(main_frame, height=10, width=70)
-        self.info_text.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
+        self.info_text.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
 
         main_frame.columnconfigure(1, weight=1)
         self.parent_frame.rowconfigure(0, weight=1)
@@ -671,9 +3506,10 @@ class PdfMergerModule:
             self.folder_var.set(directory)
 
     def log_message(self, message):
-        self.info_text.insert(tk.END, message + "\n")
-        self.info_text.see(tk.END)
-        self.info_text.update()
+        self.dispatcher.log(self.info_text, message)
+    
+    def set_progress(self, value):
+        self.dispatcher.set_var(self.progress_var, value)
     
     def clear_fields(self):
         self.folder_var.set("")
@@ -689,55 +3525,312 @@ class PdfMergerModule:
         self.merge_thread.daemon = True
         self.merge_thread.start()
 
+    def get_process_pool(self):
+        if self.process_pool is None:
+            self.process_pool = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1))
+        return self.process_pool
+    
+    def scan_files(self, paths):
+        """Pre-scan every input in the process pool; returns the merge plan and the (path, reason)
+        list of files that cannot be merged."""
+        self.log_message(f"Scanning {len(paths)} PDF files...")
+        results = {}
+        futures = {self.get_process_pool().submit(scan_pdf, path): path for path in paths}
+        for i, future in enumerate(as_completed(futures)):
+            try:
+                results[futures[future]] = future.result()
+            except Exception:
+                # scan_pdf reports file problems itself, so this is the pool failing; scan here instead
+                results[futures[future]] = scan_pdf(futures[future])
+            self.set_progress((i + 1) / len(paths) * 10)
+        
+        plan = []
+        bad_files = []
+        for path in paths:
+            result = results[path]
+            if result['error']:
+                bad_files.append((path, result['error']))
+                self.log_message(f"Skipping {os.path.basename(path)}: {result['error']}")
+            elif result['pages'] == 0:
+                bad_files.append((path, "no pages"))
+                self.log_message(f"Skipping {os.path.basename(path)}: no pages")
+            else:
+                plan.append(result)
+        self.log_message(f"{len(plan)} files, {sum(r['pages'] for r in plan)} pages to merge")
+        return plan, bad_files
+    
+    def load_merge_manifest(self, output_path):
+        """The manifest of the last merge into ``output_path``, if the output is still as it left it."""
+        try:
+            with open(output_path + '.manifest.json', 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            stat = os.stat(output_path)
+        except (OSError, ValueError):
+            return None
+        if stat.st_size != manifest['output']['size'] or stat.st_mtime != manifest['output']['mtime']:
+            return None
+        return manifest
+    
+    def save_merge_manifest(self, output_path, inputs, state):
+        stat = os.stat(output_path)
+        manifest = {'inputs': inputs, 'output': {'size': stat.st_size, 'mtime': stat.st_mtime}}
+        manifest.update(state)
+        write_json_atomic(output_path + '.manifest.json', manifest)
+    
+    def new_inputs(self, folder, pdf_files, manifest):
+        """Files to append when the manifest's inputs are an unchanged prefix of ``pdf_files``;
+        None when anything before the new files changed and a full rebuild is needed."""
+        previous = manifest['inputs']
+        if len(pdf_files) < len(previous):
+            return None
+        for entry, name in zip(previous, pdf_files):
+            if entry['name'] != name:
+                return None
+            path = os.path.join(folder, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            if stat.st_size != entry['size']:
+                return None
+            if stat.st_mtime != entry['mtime'] and (not entry.get('sha256') or file_sha256(path) != entry['sha256']):
+                return None
+        return pdf_files[len(previous):]
+    
+    def manifest_entry(self, path, sha256, skipped=False):
+        stat = os.stat(path)
+        return {'name': os.path.basename(path), 'size': stat.st_size, 'mtime': stat.st_mtime,
+                'sha256': sha256, 'skipped': skipped}
+    
+    def handle_bad_files(self, folder, bad_files):
+        if not bad_files:
+            return
+        if self.bad_files_var.get() == "quarantine":
+            quarantine = os.path.join(folder, "_quarantine")
+            os.makedirs(quarantine, exist_ok=True)
+            for path, reason in bad_files:
+                try:
+                    os.replace(path, os.path.join(quarantine, os.path.basename(path)))
+                except OSError as e:
+                    self.log_message(f"Could not quarantine {os.path.basename(path)}: {str(e)}")
+            with open(os.path.join(quarantine, "reasons.txt"), 'a', encoding='utf-8') as f:
+                for path, reason in bad_files:
+                    f.write(f"{os.path.basename(path)}\t{reason}\n")
+            self.log_message(f"Moved {len(bad_files)} bad files to {quarantine}")
+        else:
+            self.log_message(f"Skipped {len(bad_files)} bad files: " + ", ".join(os.path.basename(p) for p, _ in bad_files))
+    
+    def batch_groups(self, root, output_name):
+        """(folder, output path, file names) for every merge in a batch: one per subfolder of
+        ``root``, or one per glob pattern over the PDFs in ``root`` itself."""
+        groups = []
+        if self.batch_var.get() == "per subfolder":
+            for name in sorted(os.listdir(root), key=natural_sort_key):
+                folder = os.path.join(root, name)
+                if name == "_quarantine" or not os.path.isdir(folder):
+                    continue
+                pdf_files = sorted((f for f in os.listdir(folder)
+                                    if f.lower().endswith('.pdf') and f.lower() != output_name.lower()),
+                                   key=natural_sort_key)
+                if pdf_files:
+                    groups.append((folder, os.path.join(folder, output_name), pdf_files))
+            return groups
+        
+        patterns = [p.strip() for p in self.patterns_var.get().split(',') if p.strip()]
+        stem = os.path.splitext(output_name)[0]
+        outputs = {}
+        for pattern in patterns:
+            label = re.sub(r'[^\w-]+', '_', os.path.splitext(pattern)[0]).strip('_') or "group"
+            output = f"{stem}_{label}.pdf"
+            # two patterns with the same label would have two workers writing one file
+            suffix = 1
+            while output.lower() in {o.lower() for o in outputs.values()}:
+                suffix += 1
+                output = f"{stem}_{label}_{suffix}.pdf"
+            outputs[pattern] = output
+        excluded = {o.lower() for o in outputs.values()} | {output_name.lower()}
+        names = [f for f in os.listdir(root) if f.lower().endswith('.pdf') and f.lower() not in excluded]
+        for pattern in patterns:
+            pdf_files = sorted((f for f in names if fnmatch.fnmatch(f.lower(), pattern.lower())), key=natural_sort_key)
+            if pdf_files:
+                groups.append((root, os.path.join(root, outputs[pattern]), pdf_files))
+            else:
+                self.log_message(f"No PDF files match {pattern}")
+        return groups
+    
+    def merge_batch(self, root, output_name):
+        """Merge every group from ``batch_groups`` in the process pool, several groups at a time."""
+        self.log_message(f"Starting batch PDF merge ({self.batch_var.get()})...")
+        self.set_progress(0)
+        groups = []
+        for folder, output_path, pdf_files in self.batch_groups(root, output_name):
+            manifest = self.load_merge_manifest(output_path)
+            if manifest and self.new_inputs(folder, pdf_files, manifest) == []:
+                self.log_message(f"{os.path.relpath(output_path, root)} is already up to date")
+                continue
+            groups.append((folder, output_path, pdf_files))
+        if not groups:
+            self.set_progress(100)
+            self.dispatcher.call(messagebox.showinfo, "Success", "Nothing to merge, every output is up to date")
+            return
+        
+        self.log_message(f"Merging {len(groups)} groups, {sum(len(g[2]) for g in groups)} files")
+        dedup = self.dedup_var.get()
+        futures = {self.get_process_pool().submit(merge_pdf_group, [os.path.join(folder, f) for f in pdf_files],
+                                                  output_path, dedup): (folder, output_path, pdf_files)
+                   for folder, output_path, pdf_files in groups}
+        failed = 0
+        bad_files = {}
+        for done, future in enumerate(as_completed(futures), 1):
+            folder, output_path, pdf_files = futures[future]
+            name = os.path.relpath(output_path, root)
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                self.log_message(f"Failed to merge {name}: {str(e)}")
+                continue
+            finally:
+                self.set_progress(done / len(groups) * 100)
+            
+            if not result['merged']:
+                failed += 1
+                self.log_message(f"Failed to merge {name}: none of the PDF files could be read")
+            else:
+                entries = [self.manifest_entry(path, sha256) for path, sha256 in result['merged']]
+                if self.bad_files_var.get() != "quarantine":
+                    entries += [self.manifest_entry(path, None, skipped=True) for path, _ in result['bad_files']]
+                order = {f: i for i, f in enumerate(pdf_files)}
+                entries.sort(key=lambda entry: order[entry['name']])
+                self.save_merge_manifest(output_path, entries, result['state'])
+                message = f"Merged {name}: {len(result['merged'])} files, {result['pages']} pages"
+                if dedup:
+                    message += (f", {result['duplicate_streams']} streams deduplicated "
+                                f"({result['bytes_saved'] / (1024 * 1024):.1f} MB saved)")
+                self.log_message(message)
+            for path, features in result['dropped']:
+                self.log_message(f"{os.path.relpath(path, root)}: {', '.join(features)} not carried over")
+            for path, reason in result['bad_files']:
+                self.log_message(f"Skipping {os.path.relpath(path, root)}: {reason}")
+                bad_files.setdefault(folder, {})[path] = reason
+        
+        # only once every group is done, since a file can be in more than one pattern group
+        for folder, reasons in bad_files.items():
+            self.handle_bad_files(folder, list(reasons.items()))
+        
+        if failed:
+            self.dispatcher.call(messagebox.showwarning, "Warning", f"Batch merge finished, {failed} of {len(groups)} groups failed")
+        else:
+            self.dispatcher.call(messagebox.showinfo, "Success", f"Batch merge completed! {len(groups)} PDFs written")
+    
     def merge_pdfs(self):
         folder = self.folder_var.get().strip()
         if not folder:
-            messagebox.showerror("Error", "Please select a folder containing PDF files")
+            self.dispatcher.call(messagebox.showerror, "Error", "Please select a folder containing PDF files")
             return
         output_name = self.output_name_var.get().strip()
-        if not output_name.endswith('.pdf'):
-            output_name += '.pdf'
-            return
         if not output_name:
-            messagebox.showerror("Error", "Please enter a valid output file name")
+            self.dispatcher.call(messagebox.showerror, "Error", "Please enter a valid output file name")
             return
+        if not output_name.lower().endswith('.pdf'):
+            output_name += '.pdf'
         
         try:
+            if self.batch_var.get() != "off":
+                self.merge_batch(folder, output_name)
+                return
+            
             self.log_message("Starting PDF merge...")
-            self.progress_var.set(0)
+            self.set_progress(0)
             
-            pdf_files = [f for f in os.listdir(folder) if f.lower().endswith('.pdf')]
+            pdf_files = sorted((f for f in os.listdir(folder)
+                                if f.lower().endswith('.pdf') and f.lower() != output_name.lower()),
+                               key=natural_sort_key)
             if not pdf_files:
-                messagebox.showerror("Error", "No PDF files found in the selected folder")
+                self.dispatcher.call(messagebox.showerror, "Error", "No PDF files found in the selected folder")
                 return
             
-            merger = PdfMerger()
-            total_files = len(pdf_files)
+            output_path = os.path.join(folder, output_name)
+            manifest = self.load_merge_manifest(output_path)
+            new_files = self.new_inputs(folder, pdf_files, manifest) if manifest else None
+            if new_files == []:
+                self.set_progress(100)
+                self.log_message(f"{output_name} is already up to date with {len(pdf_files)} files")
+                self.dispatcher.call(messagebox.showinfo, "Success", f"{output_name} is already up to date")
+                return
+            if new_files:
+                self.log_message(f"Appending {len(new_files)} new files to {output_name}")
+                pdf_files = new_files
+            elif manifest:
+                self.log_message("Earlier inputs changed, rebuilding the whole output")
             
-            for i, pdf_file in enumerate(pdf_files):
-                pdf_path = os.path.join(folder, pdf_file)
-                merger.append(pdf_path)
-                
-                progress = (i + 1) / total_files * 100
-                self.progress_var.set(progress)
-                self.log_message(f"Merged {pdf_file} ({i + 1}/{total_files})")
+            plan, bad_files = self.scan_files([os.path.join(folder, f) for f in pdf_files])
+            if not plan and not new_files:
+                self.dispatcher.call(messagebox.showerror, "Error", "None of the PDF files could be read")
+                return
             
-            output_path = os.path.join(folder, output_name)
-            merger.write(output_path)
-            merger.close()
+            if new_files:
+                merger = StreamingPdfMerger(output_path, previous=manifest, dedup=self.dedup_var.get())
+            else:
+                merger = StreamingPdfMerger(output_path + '.part', dedup=self.dedup_var.get())
+            total_pages = sum(entry['pages'] for entry in plan)
+            pages_done = [0]
+            
+            def on_page():
+                pages_done[0] += 1
+                if pages_done[0] % 10 == 0 or pages_done[0] == total_pages:
+                    self.set_progress(10 + pages_done[0] / total_pages * 90)
+            
+            try:
+                for i, entry in enumerate(plan):
+                    pdf_file = os.path.basename(entry['path'])
+                    start_pages = pages_done[0]
+                    try:
+                        merger.append(entry['path'], page_callback=on_page)
+                    except Exception as e:
+                        pages_done[0] = start_pages + entry['pages']
+                        bad_files.append((entry['path'], f"damaged ({str(e)})"))
+                        entry['error'] = str(e)
+                        self.log_message(f"Failed to merge {pdf_file}: {str(e)}")
+                        continue
+                    self.log_message(f"Merged {pdf_file} ({i + 1}/{len(plan)}, {entry['pages']} pages)")
+                    if merger.dropped_features:
+                        self.log_message(f"{pdf_file}: {', '.join(merger.dropped_features)} not carried over")
+                merger.close()
+            except BaseException:
+                merger.abort()
+                raise
+            if not new_files:
+                os.replace(output_path + '.part', output_path)
+            self.set_progress(100)
+            
+            entries = {entry['path']: self.manifest_entry(entry['path'], entry['sha256'])
+                       for entry in plan if not entry['error']}
+            if self.bad_files_var.get() != "quarantine":
+                # skipped files stay in the folder, so they have to count as already handled next time
+                for path, reason in bad_files:
+                    entries[path] = self.manifest_entry(path, None, skipped=True)
+            inputs = manifest['inputs'] if new_files else []
+            inputs += [entries[os.path.join(folder, f)] for f in pdf_files if os.path.join(folder, f) in entries]
+            self.save_merge_manifest(output_path, inputs, merger.state())
+            self.handle_bad_files(folder, bad_files)
             
-            self.log_message(f"PDF merge completed! Output saved to: {output_path}")
-            messagebox.showinfo("Success", f"PDF merge completed! Output saved to: {output_name}")
+            if merger.dedup:
+                self.log_message(f"Deduplicated {merger.duplicate_streams} streams, "
+                                 f"saved {merger.bytes_saved / (1024 * 1024):.1f} MB")
+            self.log_message(f"PDF merge completed! {len(merger.page_numbers)} pages saved to: {output_path}")
+            self.dispatcher.call(messagebox.showinfo, "Success", f"PDF merge completed! Output saved to: {output_name}")
 
         except Exception as e:
             self.log_message(f"PDF merge failed: {str(e)}")
-            messagebox.showerror("Error", f"Failed to merge PDFs: {str(e)}")
-            self.progress_var.set(0)
+            self.dispatcher.call(messagebox.showerror, "Error", f"Failed to merge PDFs: {str(e)}")
+            self.set_progress(0)
 
 
 class FileConverterModule:
-    def __init__(self, parent_frame):
+    def __init__(self, parent_frame, dispatcher):
         self.parent_frame = parent_frame
+        self.dispatcher = dispatcher
         self.convert_thread = None
         self.conversion_options = {
             "Image": ["PNG", "JPG", "BMP", "GIF", "TIFF"],
@@ -803,9 +3896,10 @@ class FileConverterModule:
             self.output_format_combo.set("")
 
     def log_message(self, message):
-        self.info_text.insert(tk.END, message + "\n")
-        self.info_text.see(tk.END)
-        self.info_text.update()
+        self.dispatcher.log(self.info_text, message)
+    
+    def set_progress(self, value):
+        self.dispatcher.set_var(self.progress_var, value)
     
     def clear_fields(self):
         self.input_file_var.set("")
@@ -827,10 +3921,10 @@ class FileConverterModule:
         convert_type = self.convert_type_var.get()
         output_format = self.output_format_var.get().lower()
         if not all([input_path, convert_type, output_format]):
-            messagebox.showerror("Error", "Please ensure to fill in all fields.")
+            self.dispatcher.call(messagebox.showerror, "Error", "Please ensure to fill in all fields.")
             return
         try:
-            self.progress_var.set(0)
+            self.set_progress(0)
             self.log_message(f"Starting conversion of {os.path.basename(input_path)} to {output_format.upper()}...")
 
             if convert_type == "Image":
@@ -838,15 +3932,15 @@ class FileConverterModule:
             elif convert_type in ["Audio", "Video"]:
                 self.convert_media(input_path, output_format, convert_type)
 
-            self.progress_var.set(100)
+            self.set_progress(100)
             self.log_message(f"Conversion completed successfully! Output saved to {os.path.splitext(input_path)[0]}.{output_format}")
-            messagebox.showinfo("Yippee!", f"Conversion completed successfully! Output saved to {os.path.splitext(input_path)[0]}.{output_format}")
+            self.dispatcher.call(messagebox.showinfo, "Yippee!", f"Conversion completed successfully! Output saved to {os.path.splitext(input_path)[0]}.{output_format}")
 
         except Exception as e:
             self.log_message(f"Conversion failed: {str(e)}")
-            messagebox.showerror("Error", f"Conversion failed: {str(e)}")
+            self.dispatcher.call(messagebox.showerror, "Error", f"Conversion failed: {str(e)}")
         finally:
-            self.progress_var.set(0)
+            self.set_progress(0)
 
     def convert_image(self, input_path, output_format):
         output_path = self.generate_output_path(input_path, output_format)
@@ -908,6 +4002,8 @@ class MultiFunctionApp:
         self.root.title("Stevie's File Emporium")
         self.root.geometry("900x700")
         
+        self.dispatcher = UiDispatcher(root)
+        
 
         self.music = BackgroundMusic()
         
@@ -927,22 +4023,22 @@ class MultiFunctionApp:
 
         self.youtube_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.youtube_frame, text="YouTube Converter")
-        self.youtube_converter = YouTubeConverter(self.youtube_frame)
+        self.youtube_converter = YouTubeConverter(self.youtube_frame, self.dispatcher)
         
 
         self.scraper_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.scraper_frame, text="Web Scraper")
-        self.web_scraper = WebScraper(self.scraper_frame)
+        self.web_scraper = WebScraper(self.scraper_frame, self.dispatcher)
         
 
         self.pdf_merger_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.pdf_merger_frame, text="PDF Merger")
-        self.pdf_merger = PdfMergerModule(self.pdf_merger_frame)
+        self.pdf_merger = PdfMergerModule(self.pdf_merger_frame, self.dispatcher)
         self.placeholder_frame2 = ttk.Frame(self.notebook)
 
         self.file_converter_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.file_converter_frame, text='File Converter')
-        self.file_converter = FileConverterModule(self.file_converter_frame)
+        self.file_converter = FileConverterModule(self.file_converter_frame, self.dispatcher)
         
         
 
@@ -0,0 +1,72 @@
+"""Compare HTML parser backends and targeted parsing on a synthetic multi-megabyte page.
+
+Usage: python benchmarks/parser_benchmark.py [size_mb] [preset]
+"""
+import importlib.util
+import sys
+import time
+from pathlib import Path
+
+
+def load_emporium():
+    path = Path(__file__).resolve().parent.parent / "Stevie's file emporium.py"
+    spec = importlib.util.spec_from_file_location("emporium", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_page(size_mb):
+    blocks = []
+    size = 0
+    i = 0
+    while size < size_mb * 1024 * 1024:
+        block = (f'<div class="card" id="c{i}"><h2>Item {i}</h2>'
+                 f'<p>Some <b>description</b> text for item {i}, with a bit of <i>markup</i>.</p>'
+                 f'<a href="/items/{i}" title="Item {i}">Open item {i}</a>'
+                 f'<img src="/img/{i}.png" alt="Image {i}">'
+                 f'<table><tr><th>Key</th><th>Value</th></tr><tr><td>id</td><td>{i}</td></tr></table>'
+                 f'<span data-x="{i}">{"filler " * 10}</span></div>\n')
+        blocks.append(block)
+        size += len(block)
+        i += 1
+    return "<html><head><title>Benchmark</title></head><body>" + "".join(blocks) + "</body></html>"
+
+
+def time_parse(emporium, html, parser, only_tags, selector, repeat=3):
+    best = None
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        soup = emporium.make_soup(html, parser, only_tags)
+        count = len(soup.select(selector))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count
+
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    preset = sys.argv[2] if len(sys.argv) > 2 else "links"
+    emporium = load_emporium()
+    selector, tags = emporium.SCRAPE_PRESETS[preset]
+    html = build_page(size_mb)
+    print(f"Page size: {len(html) / 1024 / 1024:.1f} MB, preset: {preset} ({selector})")
+
+    has_lxml = importlib.util.find_spec("lxml") is not None
+    runs = [("html.parser", None), ("html.parser", tags)]
+    if has_lxml:
+        runs += [("lxml", None), ("lxml", tags)]
+    else:
+        print("lxml is not installed, skipping lxml runs")
+
+    baseline = None
+    for parser, only_tags in runs:
+        elapsed, count = time_parse(emporium, html, parser, only_tags, selector)
+        baseline = baseline or elapsed
+        mode = "targeted" if only_tags else "full"
+        print(f"{parser:12} {mode:9} {elapsed:7.3f}s  {count:7d} matches  {baseline / elapsed:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Compare peak memory of the streaming PDF merger with PyPDF2's PdfMerger as the input grows.
+
+Each merge runs in a fresh child process so its peak RSS can be read on its own.
+Usage: python benchmarks/pdf_merge_benchmark.py [total_mb ...] [--files N]
+"""
+import importlib.util
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def load_emporium():
+    path = Path(__file__).resolve().parent.parent / "Stevie's file emporium.py"
+    spec = importlib.util.spec_from_file_location("emporium", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def peak_rss_mb():
+    # ru_maxrss survives exec on Linux, so it can report the parent's peak; VmHWM does not
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def build_inputs(directory, total_mb, files):
+    from PyPDF2 import PdfWriter
+    from PyPDF2.generic import DecodedStreamObject, NameObject
+
+    pages_per_file = 4
+    page_bytes = int(total_mb * 1024 * 1024 / files / pages_per_file)
+    filler = b"% scanned page data " + b"x" * 60 + b"\n"
+    for i in range(files):
+        writer = PdfWriter()
+        for p in range(pages_per_file):
+            writer.add_blank_page(612, 792)
+            page = writer.pages[-1]
+            content = DecodedStreamObject()
+            text = f"BT /F1 24 Tf 72 720 Td (File {i} page {p}) Tj ET\n".encode("ascii")
+            content._data = text + filler * (page_bytes // len(filler))
+            page[NameObject("/Contents")] = writer._add_object(content)
+        with open(os.path.join(directory, f"{i:05d}.pdf"), "wb") as f:
+            writer.write(f)
+
+
+def run_child(engine, directory):
+    emporium = load_emporium()
+    inputs = sorted(str(p) for p in Path(directory).glob("*.pdf"))
+    output = os.path.join(tempfile.gettempdir(), f"merge_benchmark_{engine}.pdf")
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if engine == "streaming":
+        merger = emporium.StreamingPdfMerger(output)
+        for path in inputs:
+            merger.append(path)
+        merger.close()
+    else:
+        from PyPDF2 import PdfMerger
+        merger = PdfMerger()
+        for path in inputs:
+            merger.append(path)
+        merger.write(output)
+        merger.close()
+    elapsed = time.perf_counter() - start
+    print(f"{elapsed:.3f} {baseline:.1f} {peak_rss_mb():.1f} {os.path.getsize(output) / (1024 * 1024):.1f}")
+    os.remove(output)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        run_child(sys.argv[2], sys.argv[3])
+        return
+
+    args = sys.argv[1:]
+    files = 200
+    if "--files" in args:
+        index = args.index("--files")
+        files = int(args[index + 1])
+        del args[index:index + 2]
+    sizes = [float(a) for a in args] or [50, 100, 200]
+
+    print(f"{'input MB':>9} {'engine':>10} {'seconds':>8} {'RSS before MB':>14} {'peak RSS MB':>12} {'output MB':>10}")
+    for total_mb in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            build_inputs(directory, total_mb, files)
+            for engine in ("pypdf2", "streaming"):
+                result = subprocess.run([sys.executable, __file__, "--child", engine, directory],
+                                        capture_output=True, text=True)
+                if result.returncode != 0:
+                    print(f"{total_mb:9.0f} {engine:>10} failed: {result.stderr.strip().splitlines()[-1]}")
+                    continue
+                seconds, before, peak, output_mb = result.stdout.split()[-4:]
+                print(f"{total_mb:9.0f} {engine:>10} {float(seconds):8.2f} {float(before):14.1f} "
+                      f"{float(peak):12.1f} {float(output_mb):10.1f}")
+
+
+if __name__ == "__main__":
+    main()
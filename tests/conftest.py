@@ -0,0 +1,89 @@
+import hashlib
+import http.server
+import importlib.util
+import os
+import re
+import sys
+import threading
+import time
+from functools import partial
+from pathlib import Path
+
+import pytest
+
+
+def load_emporium():
+    path = Path(__file__).resolve().parent.parent / "Stevie's file emporium.py"
+    spec = importlib.util.spec_from_file_location("emporium", path)
+    module = importlib.util.module_from_spec(spec)
+    # registered so worker processes can unpickle the module-level functions sent to them
+    sys.modules["emporium"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def emporium():
+    for name in ("tkinter", "pygame", "pytubefix", "moviepy.editor", "PyPDF2", "bs4", "PIL", "requests"):
+        pytest.importorskip(name)
+    return load_emporium()
+
+
+class LocalHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves the fixture directory with Range and ETag support, recording every request."""
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers), time.monotonic()))
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            return super().do_GET()
+        with open(path, 'rb') as f:
+            data = f.read()
+        url_path = self.path.split('?')[0]
+        headers = {'Content-Type': self.guess_type(path)}
+        if self.server.etags:
+            headers['ETag'] = '"%s"' % hashlib.md5(data).hexdigest()
+            if self.headers.get('If-None-Match') == headers['ETag']:
+                self.send_response(304)
+                self.send_header('ETag', headers['ETag'])
+                self.end_headers()
+                return
+        headers.update(self.server.extra_headers.get(url_path, {}))
+        
+        match = re.match(r'bytes=(\d+)-(\d*)$', self.headers.get('Range', ''))
+        if match and self.server.ranges:
+            start = int(match.group(1))
+            end = min(int(match.group(2) or len(data) - 1), len(data) - 1)
+            body = data[start:end + 1]
+            self.send_response(206)
+            headers['Content-Range'] = f"bytes {start}-{end}/{len(data)}"
+        else:
+            body = data
+            self.send_response(200)
+        headers['Content-Length'] = str(len(body))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def local_server(tmp_path):
+    """HTTP server on 127.0.0.1 for files written to ``server.root``."""
+    root = tmp_path / "www"
+    root.mkdir()
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), partial(LocalHandler, directory=str(root)))
+    server.root = root
+    server.requests = []
+    server.extra_headers = {}
+    server.etags = False
+    server.ranges = True
+    server.url = lambda path="": f"http://127.0.0.1:{server.server_port}/{path.lstrip('/')}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,167 @@
+import time
+from email.utils import formatdate
+from urllib.parse import urljoin
+
+import pytest
+import requests
+
+
+def write_pages(root, pages):
+    for path, html in pages.items():
+        target = root / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(html, encoding='utf-8')
+
+
+def crawl(emporium, start_urls, **options):
+    options.setdefault('delay', 0)
+    visited = []
+    errors = []
+
+    def on_page(url, depth, content, status):
+        visited.append((url, depth))
+        soup = emporium.make_soup(content)
+        return [urljoin(url, a['href']) for a in soup.find_all('a', href=True)]
+
+    crawler = emporium.Crawler(**options)
+    crawler.crawl(start_urls, on_page, lambda url, e: errors.append((url, str(e))))
+    return crawler, visited, errors
+
+
+@pytest.fixture
+def site(local_server):
+    write_pages(local_server.root, {
+        "index.html": '<a href="a.html">a</a> <a href="b.html#top">b</a> <a href="a.html">again</a>',
+        "a.html": '<a href="c.html">c</a> <a href="index.html">home</a>',
+        "b.html": '<a href="http://elsewhere.invalid/">away</a>',
+        "c.html": '<a href="d.html">d</a>',
+        "d.html": '<p>deep</p>',
+    })
+    return local_server
+
+
+def test_crawl_follows_links_to_max_depth(emporium, site):
+    crawler, visited, errors = crawl(emporium, [site.url("index.html")], max_depth=2, max_pages=50)
+    pages = {url.rsplit('/', 1)[-1].split('#')[0]: depth for url, depth in visited}
+    assert pages == {"index.html": 0, "a.html": 1, "b.html": 1, "c.html": 2}
+    assert errors == []
+    assert crawler.pages_done == 4
+
+
+def test_crawl_stops_at_max_pages(emporium, site):
+    crawler, visited, _ = crawl(emporium, [site.url("index.html")], max_depth=5, max_pages=2, concurrency=1)
+    assert len(visited) == 2
+    assert crawler.pages_requested == 2
+
+
+def test_crawl_reports_errors_and_keeps_going(emporium, site):
+    _, visited, errors = crawl(emporium, [site.url("missing.html"), site.url("d.html")], max_pages=5)
+    assert [url for url, _ in visited] == [site.url("d.html")]
+    assert errors[0][0] == site.url("missing.html")
+
+
+def test_crawl_fetches_urls_as_written(emporium, local_server):
+    write_pages(local_server.root, {
+        "jobs/index.html": '<a href="page2.html">next</a>',
+        "jobs/page2.html": '<p>two</p>',
+    })
+    _, visited, errors = crawl(emporium, [local_server.url("jobs/?b=2&a=1")], max_depth=1, max_pages=5)
+    assert [url for url, _ in visited] == [local_server.url("jobs/?b=2&a=1"), local_server.url("jobs/page2.html")]
+    assert errors == []
+
+
+def test_crawl_keeps_memory_bounded(emporium, local_server, monkeypatch):
+    write_pages(local_server.root, {
+        "index.html": "".join(f'<a href="p{i}.html">{i}</a>' for i in range(200)),
+        **{f"p{i}.html": '<a href="index.html">home</a>' for i in range(200)},
+    })
+    queued = []
+    add = emporium.UrlFrontier.add
+    monkeypatch.setattr(emporium.UrlFrontier, 'add', lambda self, url, depth=0: queued.append(url) or add(self, url, depth))
+
+    crawler, visited, _ = crawl(emporium, [local_server.url("index.html")], max_depth=2, max_pages=5, concurrency=2)
+    assert len(visited) == 5
+    # links past what max_pages can reach are not queued, and fetch times are only kept on request
+    assert len(queued) == 5
+    assert crawler.fetch_times == {}
+
+    crawler, _, _ = crawl(emporium, [local_server.url("p1.html")], max_pages=1, record_times=True)
+    assert list(crawler.fetch_times) == [local_server.url("p1.html")]
+
+
+
+
+def test_crawl_fetches_each_page_once(emporium, site):
+    crawl(emporium, [site.url("index.html")], max_depth=3, max_pages=50, concurrency=2)
+    # every page was fetched once, duplicates and fragments included
+    paths = sorted(path for path, _, _ in site.requests)
+    assert paths == ["/a.html", "/b.html", "/c.html", "/d.html", "/index.html"]
+
+
+def test_rate_limiter_spaces_requests_per_host(emporium, site):
+    delay = 0.2
+    crawl(emporium, [site.url("index.html")], max_depth=3, max_pages=50, concurrency=4, delay=delay)
+    times = sorted(t for _, _, t in site.requests)
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert len(times) == 5
+    assert min(gaps) >= delay * 0.9
+
+
+def test_rate_limiter_does_not_delay_other_hosts(emporium):
+    limiter = emporium.HostRateLimiter(10)
+    limiter.wait("http://one.invalid/a")
+    limiter.wait("http://two.invalid/a")
+    assert set(limiter.next_slot) == {"one.invalid", "two.invalid"}
+
+
+def test_normalize_url(emporium):
+    assert emporium.normalize_url("HTTP://Example.com:80/jobs/?b=2&a=1#frag") == "http://example.com/jobs?a=1&b=2"
+    assert emporium.normalize_url("https://example.com") == "https://example.com/"
+
+
+def test_url_frontier_admits_each_url_once(emporium):
+    frontier = emporium.UrlFrontier(expected_urls=1000)
+    assert frontier.add("http://example.com/jobs/?b=2&a=1")
+    assert not frontier.add("http://example.com/jobs?a=1&b=2#top")
+    assert frontier.pop() == ("http://example.com/jobs/?b=2&a=1", 0)
+
+
+def test_bloom_filter_false_positive_rate(emporium):
+    bloom = emporium.BloomFilter(10000, error_rate=0.01)
+    for i in range(10000):
+        bloom.add(f"http://example.com/{i}")
+    assert all(f"http://example.com/{i}" in bloom for i in range(10000))
+    false_positives = sum(f"http://other.example/{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_http_cache_revalidates_with_etag(emporium, local_server, tmp_path):
+    local_server.etags = True
+    (local_server.root / "page.html").write_text("<p>one</p>")
+    cache = emporium.HttpCache(tmp_path / "cache")
+    session = requests.Session()
+
+    assert cache.fetch(session, local_server.url("page.html")) == ("<p>one</p>", 'fetched')
+    assert cache.fetch(session, local_server.url("page.html")) == ("<p>one</p>", 'revalidated')
+    assert local_server.requests[-1][1].get('If-None-Match')
+
+    (local_server.root / "page.html").write_text("<p>two</p>")
+    assert cache.fetch(session, local_server.url("page.html")) == ("<p>two</p>", 'fetched')
+
+
+def test_http_cache_freshness_comes_from_the_server(emporium, local_server, tmp_path):
+    (local_server.root / "plain.html").write_text("plain")
+    (local_server.root / "fresh.html").write_text("fresh")
+    (local_server.root / "expires.html").write_text("expires")
+    (local_server.root / "private.html").write_text("private")
+    local_server.extra_headers["/fresh.html"] = {'Cache-Control': 'max-age=60'}
+    local_server.extra_headers["/expires.html"] = {'Expires': formatdate(time.time() + 600, usegmt=True)}
+    local_server.extra_headers["/private.html"] = {'Cache-Control': 'no-store, max-age=60'}
+    cache = emporium.HttpCache(tmp_path / "cache")
+    session = requests.Session()
+
+    statuses = [cache.fetch(session, local_server.url(page))[1]
+                for page in ("plain.html", "plain.html", "fresh.html", "fresh.html", "expires.html", "expires.html",
+                             "private.html", "private.html")]
+    assert statuses == ['fetched', 'fetched', 'fetched', 'fresh', 'fetched', 'fresh', 'fetched', 'fetched']
+    assert len(local_server.requests) == 6
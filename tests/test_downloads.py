@@ -0,0 +1,116 @@
+import json
+import os
+
+import pytest
+import requests
+
+
+@pytest.fixture
+def payload(local_server):
+    data = os.urandom(300 * 1024 + 17)
+    (local_server.root / "video.bin").write_bytes(data)
+    return data
+
+
+def range_requests(server):
+    return [headers['Range'] for path, headers, _ in server.requests if 'Range' in headers]
+
+
+def test_segmented_download_fetches_every_range(emporium, local_server, payload, tmp_path):
+    target = str(tmp_path / "video.bin")
+    progress = []
+    downloader = emporium.SegmentedDownloader(connections=4, segment_size=64 * 1024)
+    downloader.download(local_server.url("video.bin"), target, len(payload), progress.append)
+
+    with open(target, 'rb') as f:
+        assert f.read() == payload
+    assert len(range_requests(local_server)) == 5
+    assert progress[-1] == len(payload)
+    assert not os.path.exists(target + '.part')
+    assert not os.path.exists(target + '.part.json')
+
+
+def test_segmented_download_falls_back_without_range_support(emporium, local_server, payload, tmp_path):
+    local_server.ranges = False
+    target = str(tmp_path / "video.bin")
+    progress = []
+    downloader = emporium.SegmentedDownloader(connections=2, segment_size=64 * 1024)
+    downloader.download(local_server.url("video.bin"), target, len(payload), progress.append)
+
+    with open(target, 'rb') as f:
+        assert f.read() == payload
+    assert progress[-1] == len(payload)
+    assert [headers.get('Range') for _, headers, _ in local_server.requests].count(None) == 1
+
+
+def test_segmented_download_resumes_from_journal(emporium, local_server, payload, tmp_path):
+    target = str(tmp_path / "video.bin")
+    segment = 64 * 1024
+    downloader = emporium.SegmentedDownloader(connections=2, segment_size=segment)
+    # an earlier run that finished the first two ranges
+    with open(target + '.part', 'wb') as f:
+        f.write(payload[:2 * segment])
+        f.truncate(len(payload))
+    downloader.completed = [(0, segment - 1), (segment, 2 * segment - 1)]
+    downloader.save_journal(target + '.part.json', len(payload), "key")
+
+    downloader.download(local_server.url("video.bin"), target, len(payload), key="key")
+
+    with open(target, 'rb') as f:
+        assert f.read() == payload
+    fetched = range_requests(local_server)
+    assert len(fetched) == 3
+    assert not any(r.startswith(("bytes=0-", f"bytes={segment}-")) for r in fetched)
+
+
+def test_segmented_download_ignores_journal_for_other_stream(emporium, local_server, payload, tmp_path):
+    target = str(tmp_path / "video.bin")
+    downloader = emporium.SegmentedDownloader(connections=2, segment_size=64 * 1024)
+    with open(target + '.part', 'wb') as f:
+        f.write(b"\0" * len(payload))
+    downloader.completed = [(0, 64 * 1024 - 1)]
+    downloader.save_journal(target + '.part.json', len(payload), "old stream")
+
+    downloader.download(local_server.url("video.bin"), target, len(payload), key="new stream")
+
+    with open(target, 'rb') as f:
+        assert f.read() == payload
+    assert len(range_requests(local_server)) == 5
+
+
+def test_segmented_download_checks_final_size(emporium, local_server, payload, tmp_path):
+    downloader = emporium.SegmentedDownloader(connections=2, segment_size=64 * 1024)
+    with pytest.raises(Exception):
+        downloader.download(local_server.url("video.bin"), str(tmp_path / "video.bin"), len(payload) + 1000)
+    assert not os.path.exists(tmp_path / "video.bin")
+
+
+def test_asset_downloader_stores_identical_files_once(emporium, local_server, tmp_path):
+    same = os.urandom(5000)
+    (local_server.root / "a.png").write_bytes(same)
+    (local_server.root / "b.png").write_bytes(same)
+    (local_server.root / "c.png").write_bytes(os.urandom(5000))
+    urls = [local_server.url(name) for name in ("a.png", "b.png", "c.png", "a.png", "missing.png")]
+    output_dir = str(tmp_path / "assets")
+    errors = []
+
+    # one worker, so a.png is stored before its duplicate arrives
+    downloader = emporium.AssetDownloader(requests.Session(), output_dir, workers=1)
+    stats = downloader.run(iter(urls), error_callback=lambda url, e: errors.append(url), total=len(urls))
+
+    assert (stats['downloaded'], stats['duplicate'], stats['failed']) == (2, 1, 1)
+    assert errors == [local_server.url("missing.png")]
+    assert sorted(f for f in os.listdir(output_dir) if not f.startswith('.')) == ["a.png", "c.png"]
+    with open(os.path.join(output_dir, emporium.AssetDownloader.MANIFEST), encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert manifest['urls'][local_server.url("b.png")] == "a.png"
+
+    rerun = emporium.AssetDownloader(requests.Session(), output_dir, workers=2).run(urls[:3])
+    assert (rerun['downloaded'], rerun['skipped']) == (0, 3)
+
+
+def test_pick_srcset(emporium):
+    srcset = "small.jpg 320w, medium.jpg 800w, large.jpg 1600w"
+    assert emporium.pick_srcset(srcset, 0) == "large.jpg"
+    assert emporium.pick_srcset(srcset, 700) == "medium.jpg"
+    assert emporium.pick_srcset("a.jpg 1x, b.jpg 2x", 0) == "b.jpg"
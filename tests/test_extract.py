@@ -0,0 +1,187 @@
+import csv
+import json
+import sqlite3
+
+import pytest
+import requests
+
+
+def test_make_soup_falls_back_to_html_parser(emporium, monkeypatch):
+    html = "<p>one</p><a href='/x'>link</a><p>two</p>"
+    soup = emporium.make_soup(html, "no-such-parser")
+    assert soup.builder.NAME == "html.parser"
+    assert [p.get_text() for p in soup.find_all('p')] == ["one", "two"]
+
+    find_spec = emporium.importlib.util.find_spec
+    monkeypatch.setattr(emporium.importlib.util, 'find_spec',
+                        lambda name, *args: None if name == "lxml" else find_spec(name, *args))
+    assert emporium.make_soup(html).builder.NAME == "html.parser"
+
+
+def test_make_soup_parses_only_requested_tags(emporium):
+    soup = emporium.make_soup("<p>one</p><a href='/x'>link</a><p>two</p>", only_tags=["a"])
+    assert soup.find_all('p') == []
+    assert [a['href'] for a in soup.find_all('a')] == ["/x"]
+
+
+def parse_table(emporium, html):
+    return emporium.extract_table(emporium.make_soup(html, "html.parser").find('table'))
+
+
+def test_extract_table_expands_spans(emporium):
+    columns = parse_table(emporium, """
+        <table>
+          <thead><tr><th>Name</th><th colspan="2">Score</th></tr></thead>
+          <tr><td rowspan="2">Ann</td><td>1</td><td>2</td></tr>
+          <tr><td colspan="2">3</td></tr>
+          <tr><td>Bob</td><td>4</td><td><table><tr><td>nested</td></tr></table>5</td></tr>
+        </table>""")
+    assert list(columns) == ["Name", "Score", "Score_2"]
+    assert columns["Name"] == ["Ann", "Ann", "Bob"]
+    assert columns["Score"] == ["1", "3", "4"]
+    assert columns["Score_2"] == ["2", "3", "nested5"]
+
+    # rows that end before cells spanning down from the row above
+    columns = parse_table(emporium, "<table><tr><td>a</td><td rowspan=2>b</td><td rowspan=2>c</td></tr><tr></tr></table>")
+    assert columns == {"col_1": ["a", ""], "col_2": ["b", "b"], "col_3": ["c", "c"]}
+    columns = parse_table(emporium, """
+        <table>
+          <tr><td>a</td><td>b</td><td rowspan="2">c</td><td rowspan="2">d</td></tr>
+          <tr><td>1</td></tr>
+        </table>""")
+    assert columns == {"col_1": ["a", "1"], "col_2": ["b", ""], "col_3": ["c", "c"], "col_4": ["d", "d"]}
+
+
+def test_extract_table_without_header(emporium):
+    columns = parse_table(emporium, "<table><tr><td>a</td><td>b</td></tr><tr><td>c</td></tr></table>")
+    assert columns == {"col_1": ["a", "c"], "col_2": ["b", ""]}
+    assert parse_table(emporium, "<table></table>") == {}
+
+
+def test_table_item_rows(emporium):
+    item = {'table_index': 2, 'header': ["a", "b"], 'row_count': 2, 'columns': {"a": ["1", "2"], "b": ["x", "y"]}}
+    assert list(emporium.table_item_rows(item)) == [
+        {'table_index': 2, 'row_index': 1, 'a': "1", 'b': "x"},
+        {'table_index': 2, 'row_index': 2, 'a': "2", 'b': "y"},
+    ]
+
+
+def test_csv_sink_widens_header(emporium, tmp_path):
+    path = str(tmp_path / "out.csv")
+    sink = emporium.CsvSink(path)
+    sink.write({'text': "one"})
+    sink.write({'text': "two", 'url': "http://example.com/"})
+    sink.write({'tags': ["a", "b"]})
+    sink.close()
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert rows == [
+        {'text': "one", 'url': "", 'tags': ""},
+        {'text': "two", 'url': "http://example.com/", 'tags': ""},
+        {'text': "", 'url': "", 'tags': '["a", "b"]'},
+    ]
+
+
+def test_ndjson_sink(emporium, tmp_path):
+    path = str(tmp_path / "out.ndjson")
+    sink = emporium.NdjsonSink(path)
+    sink.write({'text': "é"})
+    sink.write({'n': 1})
+    sink.close()
+    with open(path, encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [{'text': "é"}, {'n': 1}]
+
+
+def test_sqlite_sink_items_and_tables(emporium, tmp_path):
+    path = str(tmp_path / "out.db")
+    sink = emporium.SqliteSink(path, flush_every=2)
+    sink.write({'text': "one"})
+    sink.write({'text': "two"})
+    sink.write({'text': "three", 'select': "reserved word"})
+    assert sink.write_table("http://example.com/", 1, {"name": ["a", "b"], "age": ["1", "2"]}) == "table_1"
+    assert sink.write_table("http://example.com/", 2, {}) == "table_2"
+    assert sink.write_table("http://example.com/", 3, {"Price": ["1"], "PRICE": ["2"], "Price_2": ["3"]}) == "table_3"
+    sink.write({'Text': "four"})
+    sink.close()
+
+    connection = sqlite3.connect(path)
+    assert connection.execute('SELECT text, "select", text_2 FROM items').fetchall() == [
+        ("one", None, None), ("two", None, None), ("three", "reserved word", None), (None, None, "four")]
+    assert connection.execute("SELECT * FROM table_1").fetchall() == [("a", "1"), ("b", "2")]
+    assert connection.execute("SELECT COUNT(*) FROM table_2").fetchone() == (0,)
+    # SQLite column names ignore case
+    assert connection.execute("SELECT Price, PRICE_2, Price_2_2 FROM table_3").fetchall() == [("1", "2", "3")]
+    assert connection.execute("SELECT name, table_index, row_count FROM scraped_tables ORDER BY name").fetchall() == [
+        ("table_1", 1, 2), ("table_2", 2, 0), ("table_3", 3, 1)]
+    connection.close()
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+def test_columnar_sink(emporium, tmp_path, file_format):
+    pyarrow = pytest.importorskip("pyarrow")
+    path = tmp_path / "out"
+    sink = emporium.ColumnarSink(str(path), file_format=file_format, batch_size=2)
+    for i in range(5):
+        sink.write({'text': f"item {i}", 'n': i})
+    sink.write_table("http://example.com/", 1, {"name": ["a", "b"]})
+    sink.close()
+
+    if file_format == "parquet":
+        import pyarrow.parquet
+        read = pyarrow.parquet.read_table
+    else:
+        import pyarrow.feather
+        read = pyarrow.feather.read_table
+    items = pyarrow.concat_tables(read(str(p)) for p in sorted(path.glob("part-*")))
+    assert items.column("text").to_pylist() == [f"item {i}" for i in range(5)]
+    table = read(str(next(path.glob("table_1*"))))
+    assert table.column("name").to_pylist() == ["a", "b"]
+
+
+def test_scrape_diff_state(emporium, tmp_path):
+    state = emporium.ScrapeDiffState(tmp_path)
+    first = [{'url': "http://a/", 'text': "A"}, {'url': "http://b/", 'text': "B"}]
+    changes, current = state.diff(None, first, "links")
+    assert [c['change'] for c in changes] == ["added", "added"]
+    state.save("http://page/", "links", "a", {'items': current})
+
+    second = [{'url': "http://a/", 'text': "A renamed"}, {'url': "http://c/", 'text': "C"}]
+    changes, _ = state.diff(state.load("http://page/", "links", "a"), second, "links")
+    assert sorted((c['change'], c['url']) for c in changes) == [
+        ("added", "http://c/"), ("changed", "http://a/"), ("removed", "http://b/")]
+    assert state.load("http://page/", "links", "other selector") is None
+
+    # repeated identities are told apart by position, so duplicates aren't reported as changes
+    same = [{'url': "http://a/", 'text': "A"}, {'url': "http://a/", 'text': "A"}]
+    _, current = state.diff(None, same, "links")
+    assert state.diff({'items': current}, same, "links")[0] == []
+
+
+def stream(emporium, html, selector, keep_markup=False):
+    found = []
+    extractor = emporium.StreamingExtractor(selector, found.append, keep_markup)
+    # fed in small pieces, the way a download arrives
+    for i in range(0, len(html), 7):
+        extractor.feed(html[i:i + 7])
+    extractor.close()
+    return found
+
+
+def test_streaming_extractor_ends_matches_like_a_browser(emporium):
+    found = stream(emporium, "<ul><li>a <b>bold</i> tail</b> more</li><li>two</ul><p>after</p>", "li", True)
+    assert [element.get_text() for element in found] == ["a bold tail more", "two"]
+    assert found[0].markup == "<li>a <b>bold tail</b> more</li>"
+
+    found = stream(emporium, "<div><p class=x>one<div>two</div></div><ul><li class=x>a<li class=x>b</ul>", ".x")
+    assert [element.get_text() for element in found] == ["one", "a", "b"]
+
+
+def test_stream_elements_matches_while_downloading(emporium, local_server):
+    rows = "".join(f'<li class="job" data-id="{i}"><a href="/j/{i}">Job {i}</a></li>' for i in range(2000))
+    (local_server.root / "jobs.html").write_text(f"<html><body><ul>{rows}</ul><p>end</p></body></html>")
+    found = []
+    emporium.stream_elements(requests.Session(), local_server.url("jobs.html"), "li.job", found.append,
+                             chunk_size=1024)
+    assert len(found) == 2000
+    assert found[5].attrs['data-id'] == "5"
+    assert found[5].get_text() == "Job 5"
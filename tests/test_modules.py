@@ -0,0 +1,95 @@
+import pytest
+
+
+@pytest.fixture
+def root(emporium):
+    try:
+        root = emporium.tk.Tk()
+    except emporium.tk.TclError:
+        pytest.skip("no display available")
+    root.withdraw()
+    yield root
+    root.destroy()
+
+
+@pytest.mark.parametrize("name", ["YouTubeConverter", "WebScraper", "PdfMergerModule", "FileConverterModule"])
+def test_module_builds(emporium, root, name):
+    frame = emporium.ttk.Frame(root)
+    module = getattr(emporium, name)(frame, emporium.UiDispatcher(root))
+    assert module.dispatcher is not None
+
+
+def test_load_url_list(emporium, tmp_path):
+    text_list = tmp_path / "urls.txt"
+    text_list.write_text("# jobs\nhttp://example.com/a?ids=1,2\n\n  https://example.com/b  \nnot a url\n"
+                         "http://example.com/a?ids=1,2\n", encoding='utf-8')
+    assert emporium.WebScraper.load_url_list(None, str(text_list)) == [
+        "http://example.com/a?ids=1,2", "https://example.com/b"]
+
+    csv_list = tmp_path / "urls.csv"
+    csv_list.write_text('url,label\n"http://example.com/c?q=a,b",first\nhttp://example.com/d,"x, y"\n,empty\n',
+                        encoding='utf-8-sig')
+    assert emporium.WebScraper.load_url_list(None, str(csv_list)) == [
+        "http://example.com/c?q=a,b", "http://example.com/d"]
+
+
+class FakeRoot:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, interval, func):
+        self.scheduled.append(func)
+
+
+class FakeText:
+    def __init__(self):
+        self.inserts = []
+
+    def insert(self, index, text):
+        self.inserts.append(text)
+
+    def index(self, index):
+        return f"{sum(text.count(chr(10)) for text in self.inserts) + 1}.0"
+
+    def delete(self, start, end):
+        pass
+
+    def see(self, index):
+        pass
+
+
+def test_dispatcher_batches_logs_and_keyed_updates(emporium):
+    root = FakeRoot()
+    dispatcher = emporium.UiDispatcher(root)
+    widget = FakeText()
+    calls = []
+    dispatcher.log(widget, "one")
+    dispatcher.call(calls.append, "progress 10", key="progress")
+    dispatcher.log(widget, "two")
+    dispatcher.call(calls.append, "status")
+    dispatcher.call(calls.append, "progress 20", key="progress")
+    root.scheduled.pop()()
+
+    assert widget.inserts == ["one\ntwo\n"]
+    assert calls == ["status", "progress 20"]
+    assert len(root.scheduled) == 1
+
+
+def test_dispatcher_survives_failing_updates(emporium):
+    root = FakeRoot()
+    dispatcher = emporium.UiDispatcher(root)
+    calls = []
+
+    def broken():
+        raise ValueError("bad update")
+
+    dispatcher.call(broken)
+    dispatcher.call(calls.append, "after")
+    root.scheduled.pop()()
+    assert calls == ["after"]
+
+    # even a failure outside the per-update handling keeps the dispatcher scheduled
+    dispatcher.collect = lambda: 1 / 0
+    with pytest.raises(ZeroDivisionError):
+        root.scheduled.pop()()
+    assert len(root.scheduled) == 1
@@ -0,0 +1,322 @@
+import json
+import os
+import re
+from types import SimpleNamespace
+
+import pytest
+
+IMAGE = os.urandom(40000)
+
+
+def build_pdf(path, label, pages=2, image=IMAGE):
+    """A small PDF whose pages share one image XObject, like a scan with a letterhead logo."""
+    from PyPDF2 import PdfWriter
+    from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+
+    writer = PdfWriter()
+    logo = DecodedStreamObject()
+    logo._data = image
+    logo.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Image'),
+        NameObject('/Width'): NumberObject(200),
+        NameObject('/Height'): NumberObject(200),
+        NameObject('/ColorSpace'): NameObject('/DeviceGray'),
+        NameObject('/BitsPerComponent'): NumberObject(8),
+    })
+    logo_ref = writer._add_object(logo)
+    for p in range(pages):
+        writer.add_blank_page(612, 792)
+        page = writer.pages[-1]
+        content = DecodedStreamObject()
+        content._data = f"q 100 0 0 100 72 600 cm /Logo Do Q BT /F1 12 Tf 72 720 Td ({label} {p}) Tj ET".encode('ascii')
+        page[NameObject('/Contents')] = writer._add_object(content)
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/XObject'): DictionaryObject({NameObject('/Logo'): logo_ref}),
+        })
+    with open(path, 'wb') as f:
+        writer.write(f)
+    return str(path)
+
+
+def page_texts(path):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(str(path))
+    return [page.get_contents().get_data().decode('ascii').rsplit('(', 1)[1].split(')')[0]
+            for page in reader.pages]
+
+
+def logos(path):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(str(path))
+    return [page['/Resources']['/XObject']['/Logo'].get_object().get_data() for page in reader.pages]
+
+
+def in_use_offsets(path):
+    data = open(path, 'rb').read()
+    return [int(offset) for offset in re.findall(rb"^(\d{10}) 00000 n", data, re.M)]
+
+
+def add_bookmarks(path, label):
+    """Rewrite ``path`` with a bookmark on its first page that has a child on its last page, and a
+    second top-level bookmark."""
+    from PyPDF2 import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    for page in PdfReader(path).pages:
+        writer.add_page(page)
+    last = len(writer.pages) - 1
+    top = writer.add_outline_item(f"{label} start", 0)
+    writer.add_outline_item(f"{label} detail", last, parent=top)
+    writer.add_outline_item(f"{label} end", last)
+    with open(path, 'wb') as f:
+        writer.write(f)
+    return path
+
+
+def bookmarks(path):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(str(path))
+
+    def walk(items, depth):
+        for item in items:
+            if isinstance(item, list):
+                yield from walk(item, depth + 1)
+            else:
+                yield depth, item.title, reader.get_destination_page_number(item)
+    return list(walk(reader.outline, 0))
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    return [build_pdf(tmp_path / f"{name}.pdf", name, pages) for name, pages in (("a", 2), ("b", 3), ("c", 1))]
+
+
+def merge(emporium, inputs, output, **options):
+    merger = emporium.StreamingPdfMerger(str(output), **options)
+    for path in inputs:
+        merger.append(path)
+    merger.close()
+    return merger
+
+
+def test_merge_round_trip(emporium, inputs, tmp_path):
+    output = tmp_path / "merged.pdf"
+    merger = merge(emporium, inputs, output)
+
+    assert page_texts(output) == ["a 0", "a 1", "b 0", "b 1", "b 2", "c 0"]
+    assert logos(output) == [IMAGE] * 6
+    assert merger.state()['page_objects'] == list(merger.page_numbers)
+    assert 0 not in in_use_offsets(output)
+
+
+def test_incremental_update_appends_pages(emporium, inputs, tmp_path):
+    output = tmp_path / "merged.pdf"
+    first = merge(emporium, inputs[:2], output)
+    size = os.path.getsize(output)
+    # the state goes through the merge manifest between runs
+    emporium.write_json_atomic(str(output) + '.manifest.json', first.state())
+    with open(str(output) + '.manifest.json', encoding='utf-8') as f:
+        state = json.load(f)
+    assert os.listdir(tmp_path).count("merged.pdf.manifest.json") == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+    merge(emporium, inputs[2:], output, previous=state)
+
+    assert page_texts(output) == ["a 0", "a 1", "b 0", "b 1", "b 2", "c 0"]
+    assert logos(output)[-1] == IMAGE
+    data = open(output, 'rb').read()
+    assert data.count(b"%%EOF") == 2
+    assert f"/Prev {first.state()['xref_offset']}".encode('ascii') in data[size:]
+
+
+def test_dedup_stores_shared_streams_once(emporium, inputs, tmp_path):
+    plain = tmp_path / "plain.pdf"
+    deduped = tmp_path / "deduped.pdf"
+    merge(emporium, inputs, plain)
+    merger = merge(emporium, inputs, deduped, dedup=True)
+
+    assert page_texts(deduped) == page_texts(plain)
+    assert logos(deduped) == [IMAGE] * 6
+    assert merger.duplicate_streams == 2
+    assert merger.bytes_saved >= 2 * len(IMAGE)
+    assert os.path.getsize(deduped) < os.path.getsize(plain) - len(IMAGE)
+
+
+def test_failed_input_leaves_no_dangling_objects(emporium, inputs, tmp_path, monkeypatch):
+    output = tmp_path / "merged.pdf"
+    merger = emporium.StreamingPdfMerger(str(output), dedup=True)
+    merger.append(inputs[0])
+
+    # the next input fails after its first page object, before the objects it uses are written
+    write_object = merger.write_object
+    written = []
+
+    def failing_write(number, obj):
+        written.append(number)
+        if len(written) == 2:
+            raise ValueError("damaged stream")
+        write_object(number, obj)
+
+    # its logo is new to the output and shared with a later input
+    other_image = os.urandom(1000)
+    monkeypatch.setattr(merger, 'write_object', failing_write)
+    with pytest.raises(ValueError):
+        merger.append(build_pdf(tmp_path / "other.pdf", "other", image=other_image))
+    monkeypatch.setattr(merger, 'write_object', write_object)
+
+    merger.append(build_pdf(tmp_path / "d.pdf", "d", pages=1, image=other_image))
+    merger.close()
+
+    assert page_texts(output) == ["a 0", "a 1", "d 0"]
+    assert logos(output) == [IMAGE, IMAGE, other_image]
+    assert 0 not in in_use_offsets(output)
+    from PyPDF2 import PdfReader
+    assert len(PdfReader(str(output), strict=True).pages) == 3
+
+
+def test_merge_keeps_bookmarks(emporium, inputs, tmp_path):
+    add_bookmarks(inputs[0], "a")
+    add_bookmarks(inputs[2], "c")
+    output = tmp_path / "merged.pdf"
+    merge(emporium, inputs, output)
+
+    assert bookmarks(output) == [
+        (0, "a start", 0), (1, "a detail", 1), (0, "a end", 1),
+        (0, "c start", 5), (1, "c detail", 5), (0, "c end", 5),
+    ]
+
+
+def test_incremental_update_adds_bookmarks(emporium, inputs, tmp_path):
+    add_bookmarks(inputs[0], "a")
+    add_bookmarks(inputs[2], "c")
+    output = tmp_path / "merged.pdf"
+    first = merge(emporium, inputs[1:2], output)
+    second = merge(emporium, inputs[:1], output, previous=first.state())
+    merge(emporium, inputs[2:], output, previous=second.state())
+
+    assert page_texts(output) == ["b 0", "b 1", "b 2", "a 0", "a 1", "c 0"]
+    assert bookmarks(output) == [
+        (0, "a start", 3), (1, "a detail", 4), (0, "a end", 4),
+        (0, "c start", 5), (1, "c detail", 5), (0, "c end", 5),
+    ]
+
+
+def test_merge_reports_catalog_entries_it_drops(emporium, inputs, tmp_path):
+    from PyPDF2 import PdfReader, PdfWriter
+    from PyPDF2.generic import ArrayObject, DictionaryObject, NameObject
+
+    writer = PdfWriter()
+    writer.append_pages_from_reader(PdfReader(inputs[0]))
+    writer.add_named_destination("intro", 0)
+    writer._root_object[NameObject('/AcroForm')] = DictionaryObject({NameObject('/Fields'): ArrayObject()})
+    with_extras = str(tmp_path / "extras.pdf")
+    with open(with_extras, 'wb') as f:
+        writer.write(f)
+
+    merger = emporium.StreamingPdfMerger(str(tmp_path / "merged.pdf"))
+    merger.append(with_extras)
+    assert merger.dropped_features == ["form fields", "named destinations"]
+    merger.append(inputs[1])
+    assert merger.dropped_features == []
+    merger.close()
+
+
+def encrypt(path, target, user_password):
+    from PyPDF2 import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    writer.append_pages_from_reader(PdfReader(path))
+    writer.encrypt(user_password, "owner")
+    with open(target, 'wb') as f:
+        writer.write(f)
+    return str(target)
+
+
+def test_scan_pdf(emporium, inputs, tmp_path):
+    scan = emporium.scan_pdf(inputs[1])
+    assert (scan['pages'], scan['error']) == (3, None)
+    assert scan['sha256'] == emporium.file_sha256(inputs[1])
+    assert scan['size'] == os.path.getsize(inputs[1])
+
+    # an owner password alone doesn't stop reading
+    scan = emporium.scan_pdf(encrypt(inputs[0], tmp_path / "owner.pdf", ""))
+    assert (scan['pages'], scan['error']) == (2, None)
+
+    scan = emporium.scan_pdf(encrypt(inputs[0], tmp_path / "locked.pdf", "secret"))
+    assert (scan['pages'], scan['error']) == (0, "encrypted")
+
+
+def test_scan_pdf_reports_damaged_files(emporium, inputs, tmp_path):
+    data = open(inputs[1], 'rb').read()
+    (tmp_path / "truncated.pdf").write_bytes(data[:len(data) // 2])
+    (tmp_path / "empty.pdf").write_bytes(b"")
+    for name in ("truncated.pdf", "empty.pdf", "missing.pdf"):
+        scan = emporium.scan_pdf(str(tmp_path / name))
+        assert scan['pages'] == 0
+        assert scan['error'].startswith("damaged (")
+
+
+def test_merge_pdf_group_skips_bad_files(emporium, inputs, tmp_path):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"%PDF-1.4\nnot really a pdf")
+    output = str(tmp_path / "out.pdf")
+
+    result = emporium.merge_pdf_group([inputs[0], str(broken), inputs[2]], output, dedup=True)
+
+    assert result['pages'] == 3
+    assert [path for path, _ in result['merged']] == [inputs[0], inputs[2]]
+    assert [path for path, _ in result['bad_files']] == [str(broken)]
+    assert result['duplicate_streams'] == 1
+    assert page_texts(output) == ["a 0", "a 1", "c 0"]
+    assert not os.path.exists(output + '.part')
+
+
+def test_merge_pdf_group_with_nothing_to_merge(emporium, tmp_path):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"junk")
+    output = str(tmp_path / "out.pdf")
+    result = emporium.merge_pdf_group([str(broken)], output)
+    assert result['state'] is None
+    assert not os.path.exists(output) and not os.path.exists(output + '.part')
+
+
+def batch_module(mode, patterns=""):
+    """The settings ``PdfMergerModule.batch_groups`` reads, without the widgets."""
+    logs = []
+    fake = SimpleNamespace(batch_var=SimpleNamespace(get=lambda: mode), logs=logs, log_message=logs.append,
+                           patterns_var=SimpleNamespace(get=lambda: patterns))
+    return fake
+
+
+def test_batch_groups_per_subfolder(emporium, tmp_path):
+    for folder, names in (("vol10", ["b.pdf"]), ("vol2", ["p10.pdf", "p9.pdf", "merged.pdf"]),
+                          ("_quarantine", ["x.pdf"]), ("empty", ["notes.txt"])):
+        (tmp_path / folder).mkdir()
+        for name in names:
+            (tmp_path / folder / name).write_bytes(b"")
+
+    groups = emporium.PdfMergerModule.batch_groups(batch_module("per subfolder"), str(tmp_path), "merged.pdf")
+    assert [(os.path.basename(folder), os.path.basename(output), files) for folder, output, files in groups] == [
+        ("vol2", "merged.pdf", ["p9.pdf", "p10.pdf"]), ("vol10", "merged.pdf", ["b.pdf"])]
+
+
+def test_batch_groups_per_pattern(emporium, tmp_path):
+    for name in ("invoice_10.pdf", "invoice_2.pdf", "receipt.pdf", "merged.pdf", "merged_invoice.pdf"):
+        (tmp_path / name).write_bytes(b"")
+    fake = batch_module("per pattern", "invoice_*.pdf, invoice*, *.pdf, missing_*.pdf")
+
+    groups = emporium.PdfMergerModule.batch_groups(fake, str(tmp_path), "merged.pdf")
+    # outputs of earlier runs and the single-merge output are never inputs
+    assert [(os.path.basename(output), files) for _, output, files in groups] == [
+        ("merged_invoice.pdf", ["invoice_2.pdf", "invoice_10.pdf"]),
+        ("merged_invoice_2.pdf", ["invoice_2.pdf", "invoice_10.pdf"]),
+        ("merged_group.pdf", ["invoice_2.pdf", "invoice_10.pdf", "receipt.pdf"]),
+    ]
+    assert fake.logs == ["No PDF files match missing_*.pdf"]
+
+
+def test_natural_sort_key(emporium):
+    names = ["page10.pdf", "Page2.pdf", "page1.pdf", "appendix.pdf", "page2b.pdf"]
+    assert sorted(names, key=emporium.natural_sort_key) == [
+        "appendix.pdf", "page1.pdf", "Page2.pdf", "page2b.pdf", "page10.pdf"]
@@ -0,0 +1,139 @@
+import os
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+
+def converter(emporium, **overrides):
+    """Just enough of a YouTubeConverter for the methods that don't touch widgets."""
+    logs = []
+    fake = SimpleNamespace(max_retries=2, logs=logs, statuses={}, manifest=None, log_message=logs.append)
+    fake.set_video_status = lambda item_id, status: fake.statuses.__setitem__(item_id, status)
+    bind(emporium, fake, 'record_download')
+    fake.__dict__.update(overrides)
+    return fake
+
+
+def bind(emporium, fake, *names):
+    for name in names:
+        setattr(fake, name, getattr(emporium.YouTubeConverter, name).__get__(fake))
+
+
+def video(resolution, fps=30, subtype='mp4'):
+    return SimpleNamespace(is_progressive=False, is_adaptive=True, includes_video_track=True,
+                           includes_audio_track=False, subtype=subtype, resolution=resolution, fps=fps, abr=None)
+
+
+def audio(abr, subtype='mp4'):
+    return SimpleNamespace(is_progressive=False, is_adaptive=True, includes_video_track=False,
+                           includes_audio_track=True, subtype=subtype, resolution=None, fps=None, abr=abr)
+
+
+def finished(value=None, error=None):
+    future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(value)
+    return future
+
+
+def test_transcode_done_always_resolves_the_result(emporium):
+    def broken_manifest(*args):
+        raise OSError("disk full")
+
+    fake = converter(emporium, record_download=broken_manifest)
+    result = Future()
+    emporium.YouTubeConverter.transcode_done(fake, "a.m4a", "a.mp3", "0", "id", result, 1, finished())
+    assert isinstance(result.exception(timeout=1), OSError)
+    assert fake.statuses["0"] == "Failed"
+
+    fake = converter(emporium)
+    result = Future()
+    emporium.YouTubeConverter.transcode_done(fake, "a.m4a", "a.mp3", "0", "id", result, 1, finished())
+    assert result.result(timeout=1) == "a.mp3"
+    assert fake.statuses["0"] == "Done"
+
+
+def test_transcode_done_keeps_the_source_after_the_last_retry(emporium):
+    fake = converter(emporium)
+    result = Future()
+    emporium.YouTubeConverter.transcode_done(fake, "a.m4a", "a.mp3", "0", "id", result, 3,
+                                             finished(error=RuntimeError("ffmpeg crashed")))
+    assert isinstance(result.exception(timeout=1), RuntimeError)
+    assert fake.statuses["0"] == "Transcode failed"
+    assert "kept in its original format: a.m4a" in fake.logs[-1]
+
+
+def test_select_adaptive_streams(emporium):
+    fake = converter(emporium)
+    bind(emporium, fake, 'adaptive_video_streams', 'audio_streams', 'resolution_value', 'bitrate_value')
+    select = emporium.YouTubeConverter.select_adaptive_streams.__get__(fake)
+    streams = [video("360p"), video("720p", 30), video("720p", 60), video("1080p"), video("1440p", subtype='webm'),
+               audio("128kbps"), audio("160kbps", subtype='webm'), audio("48kbps")]
+
+    chosen_video, chosen_audio = select(streams, "720p")
+    assert (chosen_video.resolution, chosen_video.fps) == ("720p", 60)
+    # mp4 audio is preferred over a higher bitrate webm
+    assert chosen_audio.abr == "128kbps"
+
+    assert select(streams, "1440p")[0].resolution == "1080p"
+    # nothing small enough: the lowest resolution there is
+    assert select(streams, "144p")[0].resolution == "360p"
+    assert select([video("720p")], "720p") == (None, None)
+    assert select([audio("128kbps")], "720p") == (None, None)
+
+
+def test_disk_cache_expires_entries(emporium, tmp_path, monkeypatch):
+    cache = emporium.DiskCache(tmp_path, ttl=60)
+    cache.put("video", {'title': "One"})
+    cache.put("playlist", ["a", "b"], ttl=3600)
+    assert cache.get("video") == {'title': "One"}
+
+    later = emporium.time.time() + 120
+    monkeypatch.setattr(emporium.time, 'time', lambda: later)
+    assert cache.get("video") is None
+    assert cache.get("playlist") == ["a", "b"]
+    assert not cache.path_for("video").exists()
+
+
+def test_disk_cache_evicts_least_recently_used(emporium, tmp_path):
+    cache = emporium.DiskCache(tmp_path, max_bytes=1300)
+    cache.put("a", "first", body=b"x" * 400)
+    cache.put("b", "second", body=b"x" * 400)
+    os.utime(cache.path_for("a"), (1000, 1000))
+    os.utime(cache.path_for("b"), (2000, 2000))
+    # reading "a" makes it the most recently used
+    assert cache.get("a") == "first"
+
+    cache.put("c", "third", body=b"x" * 400)
+    assert cache.get("b") is None and cache.get_body("b") is None
+    assert cache.get("a") == "first" and cache.get_body("a") == b"x" * 400
+    assert cache.get("c") == "third"
+    assert cache.total_bytes <= 1300
+    # a fresh instance counts what is already on disk
+    assert emporium.DiskCache(tmp_path, max_bytes=1300).total_bytes == cache.total_bytes
+
+
+def test_download_manifest(emporium, tmp_path):
+    video_file = tmp_path / "clip.mp4"
+    video_file.write_bytes(b"video data")
+    manifest = emporium.DownloadManifest(str(tmp_path))
+    assert not manifest.is_complete("abc", "mp4")
+    manifest.record("abc", "mp4", str(video_file))
+
+    reloaded = emporium.DownloadManifest(str(tmp_path))
+    assert reloaded.is_complete("abc", "mp4")
+    assert not reloaded.is_complete("abc", "mp3")
+    assert reloaded.videos["abc"]["mp4"]["file"] == "clip.mp4"
+
+    # touched but unchanged: the hash still matches and the new mtime is remembered
+    os.utime(video_file, (1000, 1000))
+    assert reloaded.is_complete("abc", "mp4")
+    assert emporium.DownloadManifest(str(tmp_path)).videos["abc"]["mp4"]["mtime"] == 1000
+
+    video_file.write_bytes(b"video dat!")
+    assert not reloaded.is_complete("abc", "mp4")
+    video_file.write_bytes(b"short")
+    assert not reloaded.is_complete("abc", "mp4")
+    video_file.unlink()
+    assert not reloaded.is_complete("abc", "mp4")